@@ -1,8 +1,8 @@
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 from fastapi import Depends
-from api.managers import report_manager, evidence_manager, evaluation_spec_manager, document_manager
-from app.database import Database,database
+from api import managers
+from app.database import get_database as get_process_database
 from app.models.report.manager import ReportManager
 from app.models.evidence.manager import EvidenceManager
 from app.models.evaluation_spec.manager import EvaluationSpecManager
@@ -10,25 +10,27 @@ from app.models.document.manager import DocumentManager
 
 executor = ThreadPoolExecutor(max_workers=4)
 
+# 管理器和数据库首次创建时会阻塞（加载数据、连接数据库），因此在线程池中获取
+
 async def get_report_manager() -> ReportManager:
     """获取全局ReportManager实例"""
-    return report_manager
+    return await run_in_threadpool(managers.get_report_manager)
 
 async def get_evidence_manager() -> EvidenceManager:
     """获取全局EvidenceManager实例"""
-    return evidence_manager
+    return await run_in_threadpool(managers.get_evidence_manager)
 
 async def get_evaluation_spec_manager() -> EvaluationSpecManager:
     """获取全局EvaluationSpecManager实例"""
-    return evaluation_spec_manager
+    return await run_in_threadpool(managers.get_evaluation_spec_manager)
 
 async def get_document_manager() -> DocumentManager:
     """获取全局DocumentManager实例"""
-    return document_manager
+    return await run_in_threadpool(managers.get_document_manager)
 
-async def get_database() -> Database:
-    """获取全局Database实例"""
-    return database
+async def get_database():
+    """获取当前进程的数据库实例"""
+    return await run_in_threadpool(get_process_database)
 
 async def run_in_threadpool(func, *args):
     """在线程池中执行同步函数"""
@@ -1,15 +1,34 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from api.routes import reports_router, evidences_router, evaluation_specs_router, upload_router, database_router
+from api.routes import reports_router, evidences_router, evaluation_specs_router, upload_router, database_router, metrics_router
+from api.dependencies import run_in_threadpool
+from api.managers import init_managers
+from app.database import init_database, close_database
+from app.utils.maas_client import aclose_maas_clients
 
+# 输出INFO级别日志（含每次MaaS调用的结构化日志）
+logging.basicConfig(level=logging.INFO)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时在当前worker进程中连接数据库并创建管理器，关闭时释放连接"""
+    await run_in_threadpool(init_database)
+    await run_in_threadpool(init_managers)
+    yield
+    await aclose_maas_clients()
+    await run_in_threadpool(close_database)
 
 app = FastAPI(
     title="HXAgent API",
     description="HXAgent系统API接口",
     version="0.1.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # CORS配置
@@ -27,8 +46,9 @@ app.include_router(evidences_router, prefix="/api/v1/evidences", tags=["evidence
 app.include_router(evaluation_specs_router, prefix="/api/v1/evaluation_specs", tags=["evaluation_specs"])
 app.include_router(upload_router, prefix="/api/v1", tags=["evidences"])
 app.include_router(database_router, prefix="/api/v1/database", tags=["database"])
+app.include_router(metrics_router, prefix="/api/v1/metrics", tags=["metrics"])
 
 if __name__ == "__main__":
     import uvicorn
-    # 在启动应用前显式初始化数据
+    # 数据库和管理器在lifespan启动阶段初始化，导入本模块不会连接数据库
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,10 +1,52 @@
+import threading
 from app.models.document.manager import  DocumentManager
 from app.models.evidence.manager import EvidenceManager
 from app.models.evaluation_spec.manager import EvaluationSpecManager
 from app.models.report.manager import ReportManager
-# 全局管理器实例
-document_manager = DocumentManager()
-evidence_manager = EvidenceManager()
-evaluation_spec_manager = EvaluationSpecManager()
 
-report_manager = ReportManager()
+# 全局管理器实例，首次使用时创建（证明材料和评估规范管理器创建时会访问数据库和MaaS）
+_managers = {}
+_managers_lock = threading.Lock()
+_manager_classes = {
+    "document_manager": DocumentManager,
+    "evidence_manager": EvidenceManager,
+    "evaluation_spec_manager": EvaluationSpecManager,
+    "report_manager": ReportManager
+}
+
+
+def _get_manager(name: str):
+    if name not in _managers:
+        with _managers_lock:
+            if name not in _managers:
+                _managers[name] = _manager_classes[name]()
+    return _managers[name]
+
+
+def get_document_manager() -> DocumentManager:
+    return _get_manager("document_manager")
+
+
+def get_evidence_manager() -> EvidenceManager:
+    return _get_manager("evidence_manager")
+
+
+def get_evaluation_spec_manager() -> EvaluationSpecManager:
+    return _get_manager("evaluation_spec_manager")
+
+
+def get_report_manager() -> ReportManager:
+    return _get_manager("report_manager")
+
+
+def init_managers() -> None:
+    """启动钩子：按依赖顺序创建全部管理器，避免首个请求承担初始化耗时"""
+    for name in _manager_classes:
+        _get_manager(name)
+
+
+def __getattr__(name: str):
+    # 兼容 from api.managers import report_manager 的写法
+    if name in _manager_classes:
+        return _get_manager(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,17 +1,14 @@
 import json
-from fastapi import APIRouter, Depends, HTTPException
-from app.database import Database,get_database
-from api.dependencies import get_database, run_in_threadpool
+from fastapi import APIRouter, HTTPException
+from app.database import init_database as init_process_database
+from api.dependencies import run_in_threadpool
 
 router = APIRouter()
-database = get_database()
 
 @router.post("/init_database/")
-async def init_database(
-    databse: Database = Depends(get_database)
-):
+async def init_database():
     try:
-        await run_in_threadpool(databse.init_database)
+        await run_in_threadpool(init_process_database)
         return {
             "success": True,
             "message": "数据库初始化成功"
@@ -34,8 +34,8 @@ async def upload_evaluation_spec(
             json.dump(data, f, ensure_ascii=False, indent=4)
             
         # 处理文件
-        manager.load_from_json(spec_file)
-        manager.generate_index()
+        await manager.aload_from_json(spec_file)
+        await manager.agenerate_index()
         
         # 返回处理结果
         return {
@@ -60,7 +60,7 @@ async def generate_evaluation_spec_index(
 ):
     """生成评估规范索引"""
     try:
-        return await run_in_threadpool(manager.generate_index)
+        return await manager.agenerate_index()
     except Exception as e:
         raise HTTPException(
             status_code=500,
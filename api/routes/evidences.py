@@ -14,7 +14,7 @@ async def generate_evidence_index(
 ):
     """生成证明材料索引"""
     try:
-        return await run_in_threadpool(manager.generate_index)
+        return await manager.agenerate_index()
     except Exception as e:
         raise HTTPException(
             status_code=500,
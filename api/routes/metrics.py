@@ -0,0 +1,37 @@
+from fastapi import APIRouter
+from app.database import get_database
+from api.dependencies import run_in_threadpool
+from app.utils.cache import get_completion_cache, get_embedding_cache
+from app.utils.maas_client import coalesced_request_stats
+from app.utils.metrics import get_maas_metrics
+
+router = APIRouter()
+
+@router.get("/maas")
+async def get_maas_metrics_snapshot():
+    """获取MaaS调用统计：各接口延迟分布、token用量、重试和错误次数，以及缓存命中情况"""
+    embedding_cache = get_embedding_cache()
+    completion_cache = get_completion_cache()
+    coalesced = coalesced_request_stats()
+    return {
+        "endpoints": get_maas_metrics().snapshot(),
+        "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+        "completion_cache": completion_cache.stats() if completion_cache else None,
+        "coalesced_requests": coalesced["total"],
+        "coalesced_requests_by_client": {"sync": coalesced["sync"], "async": coalesced["async"]}
+    }
+
+@router.get("/database")
+async def get_database_metrics():
+    """获取向量库检索结果缓存和回表缓存的命中统计"""
+    database = await run_in_threadpool(get_database)
+    return database.cache_stats()
+
+@router.post("/maas/reset")
+async def reset_maas_metrics():
+    """清空MaaS调用统计"""
+    get_maas_metrics().reset()
+    return {
+        "success": True,
+        "message": "统计已清空"
+    }
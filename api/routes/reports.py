@@ -1,6 +1,6 @@
 import json
 from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from typing import List, Optional
 from concurrent.futures import ThreadPoolExecutor
 from app.models.report.manager import ReportManager
 from api.dependencies import get_report_manager, run_in_threadpool
@@ -80,11 +80,11 @@ async def get_report(
         )
         
 @router.post("/generate/")  # 设置5分钟超时 # pylint: disable=unexpected-keyword-arg
-def generate_reports(
+async def generate_reports(
     manager: ReportManager = Depends(get_report_manager)
 ):
     try:
-        result = manager.generate_report()
+        result = await manager.agenerate_report()
         if not result.get("success"):
             raise HTTPException(
                 status_code=500,
@@ -99,11 +99,14 @@ def generate_reports(
 
 @router.post("/reload-data/")
 async def reload_data(
+    project: Optional[str] = None,
     manager: ReportManager = Depends(get_report_manager)
 ):
+    """重新加载报告数据，指定project时只召回该项目的证明材料"""
     try:
         result = await run_in_threadpool(
-            manager.load_data
+            manager.load_data,
+            project
         )
         if not result.get("success"):
             raise HTTPException(
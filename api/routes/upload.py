@@ -42,7 +42,7 @@ def upload_documents(
         evidence_manager.load_from_json(file_path = "data/evidence.json")
         evidence_manager.generate_index()
         print("Evidence Updated.")
-        print(str(evidence_manager.evidences.__sizeof__()) + " evidence in total.")
+        print(f"{len(evidence_manager.evidences)} evidence in total.")
         
         report_manager.load_data()
         
@@ -1,9 +1,19 @@
 import os
+import json
 from dotenv import load_dotenv
 
 # 加载.env文件
 load_dotenv(override=True)
 
+# 各索引类型的默认构建参数和检索参数
+MILVUS_INDEX_DEFAULTS = {
+    "FLAT": ({}, {}),
+    "IVF_FLAT": ({"nlist": 128}, {"nprobe": 10}),
+    "IVF_SQ8": ({"nlist": 128}, {"nprobe": 10}),
+    "HNSW": ({"M": 16, "efConstruction": 200}, {"ef": 64}),
+    "DISKANN": ({}, {"search_list": 100}),
+}
+
 class Config:
     def __init__(self):
         # LLM 配置
@@ -20,6 +30,55 @@ class Config:
         self.EMBEDDING_BASE_URL = os.getenv('EMBEDDING_BASE_URL')
         self.EMBEDDING_API_KEY = os.getenv('EMBEDDING_API_KEY')
         self.EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL')
+        self.EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', "10"))
+        # 向量传输编码：base64（解码为float32数组，体积更小）或float（JSON浮点列表）
+        self.EMBEDDING_ENCODING_FORMAT = os.getenv('EMBEDDING_ENCODING_FORMAT', 'base64')
+
+        # 异步客户端各接口最大并发请求数
+        self.LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', "16"))
+        self.VLM_CONCURRENCY = int(os.getenv('VLM_CONCURRENCY', "4"))
+        self.EMBEDDING_CONCURRENCY = int(os.getenv('EMBEDDING_CONCURRENCY', "8"))
+
+        # 各接口限流配置（每分钟请求数/token数，0表示不限制）
+        self.LLM_RPM = int(os.getenv('LLM_RPM', "0"))
+        self.LLM_TPM = int(os.getenv('LLM_TPM', "0"))
+        self.VLM_RPM = int(os.getenv('VLM_RPM', "0"))
+        self.VLM_TPM = int(os.getenv('VLM_TPM', "0"))
+        self.EMBEDDING_RPM = int(os.getenv('EMBEDDING_RPM', "0"))
+        self.EMBEDDING_TPM = int(os.getenv('EMBEDDING_TPM', "0"))
+
+        # HTTP连接池与超时配置（单位为秒）
+        self.MAAS_MAX_CONNECTIONS = int(os.getenv('MAAS_MAX_CONNECTIONS', "100"))
+        self.MAAS_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('MAAS_MAX_KEEPALIVE_CONNECTIONS', "40"))
+        self.MAAS_KEEPALIVE_EXPIRY = float(os.getenv('MAAS_KEEPALIVE_EXPIRY', "60"))
+        self.MAAS_TIMEOUT = float(os.getenv('MAAS_TIMEOUT', "120"))
+        self.MAAS_CONNECT_TIMEOUT = float(os.getenv('MAAS_CONNECT_TIMEOUT', "10"))
+
+        # 失败重试配置（指数退避，单位为秒）
+        self.MAAS_MAX_RETRIES = int(os.getenv('MAAS_MAX_RETRIES', "5"))
+        self.MAAS_RETRY_BASE_DELAY = float(os.getenv('MAAS_RETRY_BASE_DELAY', "1.0"))
+        self.MAAS_RETRY_MAX_DELAY = float(os.getenv('MAAS_RETRY_MAX_DELAY', "60.0"))
+
+        # 嵌入向量缓存配置
+        self.EMBEDDING_CACHE_ENABLED = os.getenv('EMBEDDING_CACHE_ENABLED', 'true').lower() == 'true'
+        self.EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', 'data/cache/embedding_cache.sqlite3')
+        self.EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', "200000"))
+
+        # 大模型响应缓存配置（默认关闭）
+        self.LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'false').lower() == 'true'
+        self.LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', 'data/cache/llm_cache.sqlite3')
+        self.LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', "10000"))
+        self.LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', str(7 * 24 * 3600)))
+
+        # 向量库后端：milvus（外部Milvus服务）或 local（进程内NumPy向量库，持久化到本地目录）
+        self.DATABASE_BACKEND = os.getenv('DATABASE_BACKEND', 'milvus').lower()
+        if self.DATABASE_BACKEND not in ("milvus", "local"):
+            raise ValueError(f"不支持的DATABASE_BACKEND: {self.DATABASE_BACKEND}")
+        self.LOCAL_DATABASE_PATH = os.getenv('LOCAL_DATABASE_PATH', 'data/vector_store')
+        # 按ID回表（hydrate）的记录缓存条数，0表示不缓存
+        self.DATABASE_HYDRATE_CACHE_SIZE = int(os.getenv('DATABASE_HYDRATE_CACHE_SIZE', "10000"))
+        # 检索结果缓存的查询条数，集合写入或删除后自动失效，0表示不缓存
+        self.DATABASE_SEARCH_CACHE_SIZE = int(os.getenv('DATABASE_SEARCH_CACHE_SIZE', "2048"))
 
         # Milvus 配置
         self.MILVUS_HOST = os.getenv('MILVUS_HOST', 'localhost')
@@ -27,6 +86,28 @@ class Config:
         self.MILVUS_USER = os.getenv('MILVUS_USER')
         self.MILVUS_PASSWORD = os.getenv('MILVUS_PASSWORD')
         self.EMBEDDING_DIM = int(os.getenv('EMBEDDING_DIM', "1024"))
+        # 向量存储精度：float32 / float16 / bfloat16，半精度存储占用减半，修改后集合会重建
+        self.VECTOR_DTYPE = os.getenv('VECTOR_DTYPE', 'float32').lower()
+        if self.VECTOR_DTYPE not in ("float32", "float16", "bfloat16"):
+            raise ValueError(f"不支持的VECTOR_DTYPE: {self.VECTOR_DTYPE}")
+        # 持久化模式：启动时复用已有集合和索引，而不是删除重建
+        self.MILVUS_PERSISTENT = os.getenv('MILVUS_PERSISTENT', 'false').lower() == 'true'
+        # 批量写入时每次insert请求的行数
+        self.MILVUS_INSERT_BATCH_SIZE = int(os.getenv('MILVUS_INSERT_BATCH_SIZE', "500"))
+        # 分页导出时每页的记录数
+        self.MILVUS_QUERY_BATCH_SIZE = int(os.getenv('MILVUS_QUERY_BATCH_SIZE', "1000"))
+        # 证明材料按项目分区存储，检索时可只搜索单个项目的分区
+        self.MILVUS_PARTITION_BY_PROJECT = os.getenv('MILVUS_PARTITION_BY_PROJECT', 'true').lower() == 'true'
+        # 同时加载到内存的项目分区上限，0表示启动时加载全部分区；大于0时按需加载并释放最久未使用的分区
+        self.MILVUS_MAX_LOADED_PARTITIONS = int(os.getenv('MILVUS_MAX_LOADED_PARTITIONS', "0"))
+        # 向量索引配置，构建参数和检索参数为JSON，留空时使用该索引类型的默认值
+        self.MILVUS_INDEX_TYPE = os.getenv('MILVUS_INDEX_TYPE', 'IVF_FLAT').upper()
+        if self.MILVUS_INDEX_TYPE not in MILVUS_INDEX_DEFAULTS:
+            raise ValueError(f"不支持的MILVUS_INDEX_TYPE: {self.MILVUS_INDEX_TYPE}")
+        self.MILVUS_METRIC_TYPE = os.getenv('MILVUS_METRIC_TYPE', 'L2').upper()
+        default_index_params, default_search_params = MILVUS_INDEX_DEFAULTS[self.MILVUS_INDEX_TYPE]
+        self.MILVUS_INDEX_PARAMS = json.loads(os.getenv('MILVUS_INDEX_PARAMS') or json.dumps(default_index_params))
+        self.MILVUS_SEARCH_PARAMS = json.loads(os.getenv('MILVUS_SEARCH_PARAMS') or json.dumps(default_search_params))
         
         # 文档存储路径配置
         self.document_storage_path = os.getenv('DOCUMENT_STORAGE_PATH', 'data/documents')
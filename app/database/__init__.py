@@ -1,12 +1,68 @@
-from .database import Database
-from .evaluation_spec_operation import store_evaluation_spec, search_evaluation_spec, batch_search_evaluation_spec, retrieve_evidence_by_spec, dump_evaluation_spec
-from .evidence_operation import store_evidence, search_evidence, batch_search_evidence 
-from typing import Dict, List, Any
+from .evaluation_spec_operation import store_evaluation_spec, store_evaluation_specs, search_evaluation_spec, batch_search_evaluation_spec, retrieve_evidence_by_spec, retrieve_evidence_by_specs, dump_evaluation_spec, iter_dump_evaluation_spec, hydrate_evaluation_specs, stored_evaluation_spec_ids
+from .evidence_operation import store_evidence, store_evidences, search_evidence, batch_search_evidence, hydrate_evidences, stored_evidence_ids
+from .local_database import LocalDatabase
+from app.config.__init__ import get_config
+from typing import Dict, List, Any, Optional
+import os
+import threading
+
+
+def __getattr__(name: str):
+    # Database依赖pymilvus，仅在使用milvus后端或显式引用时才导入
+    if name == "Database":
+        from .database import Database
+        return Database
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _create_database():
+    """根据DATABASE_BACKEND配置创建向量库实例"""
+    if get_config().DATABASE_BACKEND == "local":
+        return LocalDatabase()
+    from .database import Database
+    return Database()
+
+
+# 当前进程的数据库实例，首次使用时才连接；导入本模块不会访问数据库
+_database = None
+_database_pid: Optional[int] = None
+_database_lock = threading.Lock()
+
+
+def _reset_after_fork() -> None:
+    # fork出的子进程不能复用父进程的连接，且锁可能在fork时处于持有状态
+    global _database, _database_pid, _database_lock
+    _database, _database_pid = None, None
+    _database_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
 
-database = Database()
 
 def get_database():
-    return database
+    """获取当前进程的数据库实例，首次调用时创建连接和集合"""
+    global _database, _database_pid
+    if _database is None or _database_pid != os.getpid():
+        with _database_lock:
+            if _database is None or _database_pid != os.getpid():
+                _database = _create_database()
+                _database_pid = os.getpid()
+    return _database
+
+
+def init_database():
+    """启动钩子：在服务开始接收请求前建立连接、准备集合和索引"""
+    return get_database()
+
+
+def close_database() -> None:
+    """关闭钩子：释放当前进程的数据库连接"""
+    global _database, _database_pid
+    with _database_lock:
+        if _database is not None and _database_pid == os.getpid():
+            _database.close()
+        _database, _database_pid = None, None
 
 def store_data(data: Dict[str, Any], collection_type: str = "evidence") -> str:
     """
@@ -19,10 +75,55 @@ def store_data(data: Dict[str, Any], collection_type: str = "evidence") -> str:
     Returns:
         存储数据的ID
     """
-    return database.store_data(data, collection_type)
+    return get_database().store_data(data, collection_type)
+
+
+def store_data_batch(records: List[Dict[str, Any]], collection_type: str = "evidence") -> List[str]:
+    """
+    批量存储数据到数据库
+    
+    Args:
+        records: 要存储的数据字典列表
+        collection_type: 集合类型，可选值为"evidence"或"evaluation_spec"
+    
+    Returns:
+        存储数据的ID列表
+    """
+    return get_database().store_data_batch(records, collection_type)
+
+
+def delete_by_ids(ids: List[str], collection_type: str = "evidence") -> int:
+    """
+    按ID删除数据
+    
+    Args:
+        ids: 待删除的ID列表
+        collection_type: 集合类型，可选值为"evidence"或"evaluation_spec"
+    
+    Returns:
+        删除的记录数
+    """
+    return get_database().delete_by_ids(ids, collection_type)
+
+
+def delete_by_filter(expr: str, collection_type: str = "evidence", project: Optional[str] = None) -> int:
+    """
+    删除满足过滤表达式的数据
+    
+    Args:
+        expr: 过滤表达式，如 'evidence_type == "财务报告"'
+        collection_type: 集合类型，可选值为"evidence"或"evaluation_spec"
+        project: 只删除该项目的证明材料，启用分区时只加载该项目分区
+    
+    Returns:
+        删除的记录数
+    """
+    return get_database().delete_by_filter(expr, collection_type, project)
 
 
-def search_data(query: Dict[str, Any], collection_type: str = "evidence", top_k: int = 10) -> List[Dict[str, Any]]:
+def search_data(query: Dict[str, Any], collection_type: str = "evidence", top_k: int = 10,
+                search_params: Optional[Dict[str, Any]] = None, expr: Optional[str] = None,
+                output_fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
     """
     在数据库中搜索相似数据
     
@@ -30,14 +131,17 @@ def search_data(query: Dict[str, Any], collection_type: str = "evidence", top_k:
         query: 查询字典
         collection_type: 集合类型
         top_k: 返回结果数量
+        search_params: 覆盖默认检索参数，如{"nprobe": 32}或{"ef": 128}
+        expr: 标量字段过滤表达式
+        output_fields: 结果metadata中需要的键，None返回全部
     
     Returns:
         包含匹配结果的列表
     """
-    return database.search_data(query, collection_type, top_k)
+    return get_database().search_data(query, collection_type, top_k, search_params, expr, output_fields=output_fields)
 
 
 
-__all__ = ['Database', 'get_database', 'store_data', 'search_data',
-           'store_evaluation_spec', 'search_evaluation_spec', 'batch_search_evaluation_spec', 'retrieve_evidence_by_spec',
-           'store_evidence', 'search_evidence', 'batch_search_evidence', 'dump_evaluation_spec']
\ No newline at end of file
+__all__ = ['Database', 'LocalDatabase', 'get_database', 'init_database', 'close_database', 'store_data', 'store_data_batch', 'delete_by_ids', 'delete_by_filter', 'search_data',
+           'store_evaluation_spec', 'store_evaluation_specs', 'search_evaluation_spec', 'batch_search_evaluation_spec', 'retrieve_evidence_by_spec', 'retrieve_evidence_by_specs',
+           'store_evidence', 'store_evidences', 'search_evidence', 'batch_search_evidence', 'hydrate_evidences', 'dump_evaluation_spec', 'iter_dump_evaluation_spec', 'hydrate_evaluation_specs']
\ No newline at end of file
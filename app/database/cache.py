@@ -0,0 +1,143 @@
+import hashlib
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+
+class LRUCache:
+    """线程安全的进程内LRU缓存，记录命中次数
+
+    max_entries为0时不缓存任何内容。
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """读取缓存，未命中返回None"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any, valid: Optional[Callable[[], bool]] = None) -> None:
+        """写入缓存；指定valid时在锁内再次检查，返回False则放弃写入
+
+        与先使数据失效、再pop对应键的写入方配合，可避免并发读取把过期数据写回缓存。
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if valid is not None and not valid():
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存大小和命中统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else None
+            }
+
+
+def _vector_digest(vector: Any) -> str:
+    return hashlib.blake2b(np.asarray(vector, dtype=np.float32).tobytes(), digest_size=16).hexdigest()
+
+
+class SearchCache:
+    """向量检索结果缓存
+
+    键包含集合、查询向量哈希、向量字段、融合方式、top_k、检索参数和过滤条件，以及集合的写入代号。
+    写入、覆盖和删除时递增代号，旧代号的结果不再命中，随LRU淘汰。
+    只缓存每个查询命中的(id, score)列表，命中时的metadata按ID回表获取，缓存占用与记录内容大小无关。
+    """
+
+    def __init__(self, max_entries: int):
+        self._results = LRUCache(max_entries)
+        self._generations: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def bump(self, collection_type: str) -> None:
+        """集合数据变化后调用，使该集合的已缓存结果失效"""
+        with self._lock:
+            self._generations[collection_type] += 1
+
+    def generation(self, collection_type: str) -> int:
+        """集合当前的写入代号"""
+        with self._lock:
+            return self._generations[collection_type]
+
+    def _key(self, collection_type: str, generation: int, query: Dict[str, Any], options: Tuple) -> Tuple:
+        vectors = tuple(
+            (field, _vector_digest(query[field])) for field in ("keywords_embedding", "summary_embedding") if field in query
+        )
+        ranker = (query.get("ranker", "weighted"), tuple(query.get("weights", ())), query.get("rrf_k"))
+        return (collection_type, generation, vectors, ranker, options)
+
+    def search(self, collection_type: str, queries: List[Dict[str, Any]], options: Tuple,
+               search: Callable[[List[Dict[str, Any]]], List[List[Dict[str, Any]]]],
+               hydrate: Callable[[List[str]], Dict[str, Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+        """先查缓存，只对未命中的查询调用search，结果按queries顺序返回
+
+        Args:
+            collection_type: 集合类型
+            queries: 查询字典列表
+            options: 影响命中结果的其他检索条件（top_k、检索参数、过滤表达式等），须可哈希
+            search: 实际执行检索的函数，接收未命中的查询列表
+            hydrate: 按ID批量取回metadata的函数，用于填充缓存命中的结果
+        """
+        if self._results.max_entries <= 0:
+            return search(queries)
+        generation = self.generation(collection_type)
+        keys = [self._key(collection_type, generation, query, options) for query in queries]
+
+        cached: List[Optional[List[Tuple[str, float]]]] = [self._results.get(key) for key in keys]
+        results: List[Optional[List[Dict[str, Any]]]] = [None] * len(queries)
+        missing = [index for index, hits in enumerate(cached) if hits is None]
+        if missing:
+            for index, hits in zip(missing, search([queries[index] for index in missing])):
+                self._results.put(keys[index], [(hit["id"], hit["score"]) for hit in hits])
+                results[index] = hits
+        hit_indices = [index for index, hits in enumerate(cached) if hits is not None]
+        if hit_indices:
+            metadata = hydrate(list(dict.fromkeys(data_id for index in hit_indices for data_id, _ in cached[index])))
+            # 回表时已被删除的记录跳过；每条结果使用独立的metadata副本，调用方修改结果不会相互影响
+            for index in hit_indices:
+                results[index] = [
+                    {"id": data_id, "metadata": dict(metadata[data_id]), "score": score}
+                    for data_id, score in cached[index] if data_id in metadata
+                ]
+        return results
+
+    def clear(self) -> None:
+        self._results.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            generations = dict(self._generations)
+        return {**self._results.stats(), "generations": generations}
@@ -1,265 +1,750 @@
 from ast import List
-import uuid
+import hashlib
+import itertools
+import os
+import threading
 import json
-from pymilvus import connections, Collection, utility
+import logging
+from collections import OrderedDict
+import numpy as np
+from pymilvus import connections, Collection, utility, AnnSearchRequest, WeightedRanker, RRFRanker
 from pymilvus.orm import collection
 from app.config.__init__ import get_config
-from typing import List, Dict, Tuple, Any, TYPE_CHECKING, Optional
+from .cache import LRUCache, SearchCache
+from .records import record_id
+from .vectors import to_float32, to_storage
+from typing import List, Dict, Set, Tuple, Any, TYPE_CHECKING, Optional, Iterator
 
 config = get_config()
+logger = logging.getLogger(__name__)
+
+# 集合类型与集合名称
+COLLECTION_NAMES = {
+    "evidence": "evidence_collection",
+    "evaluation_spec": "evaluation_spec_collection"
+}
+
+# 各集合的标量字段及最大长度（字节），可在检索时用表达式过滤；其余属性存入JSON类型的metadata字段。
+# content等长文本没有长度上限，不作为标量列，完整保存在JSON字段中
+SCALAR_FIELDS = {
+    "evidence": {
+        "project": 256,
+        "evidence_type": 256,
+        "collector": 256,
+        "filename": 1024,
+        "collection_time": 64
+    },
+    "evaluation_spec": {
+        "primary_title": 1024,
+        "secondary_title": 1024,
+        "tertiary_title": 1024
+    }
+}
+
+
+def _truncate_utf8(value: str, max_bytes: int) -> Optional[str]:
+    """按UTF-8字节数截断字符串，避免超出VARCHAR字段长度；未超出时返回None"""
+    data = value.encode("utf-8")
+    if len(data) <= max_bytes:
+        return None
+    return data[:max_bytes].decode("utf-8", errors="ignore")
+
 
 class Database:
     def __init__(self):
         print("Initializing Milvus database...")
 
-        # 初始化Milvus连接
+        # 初始化Milvus连接；连接别名按进程区分，fork出的worker不会复用父进程的gRPC通道
+        self.alias = f"database_{os.getpid()}"
         try:
             connections.connect(
-                "default",
+                self.alias,
                 host=config.MILVUS_HOST,
                 port=config.MILVUS_PORT,
                 user=config.MILVUS_USER,
                 password=config.MILVUS_PASSWORD
             )
-            if not connections.has_connection("default"):
+            if not connections.has_connection(self.alias):
                 raise ConnectionError("无法连接到Milvus")
         except Exception as e:
             raise ConnectionError(f"Milvus连接失败: {str(e)}")
         
-        self.drop_collection(collection_type="evidence")
-        self.drop_collection(collection_type="evaluation_spec")
+        # 证明材料的项目分区状态
+        self._partition_lock = threading.Lock()
+        self._partitions: Set[str] = set()
+        self._loaded_partitions: "OrderedDict[str, None]" = OrderedDict()
+        self._all_partitions_loaded = False
+        
+        # 按ID回表的记录缓存，写入和删除时失效
+        self._hydrated = {
+            collection_type: LRUCache(config.DATABASE_HYDRATE_CACHE_SIZE) for collection_type in COLLECTION_NAMES
+        }
+        # 检索结果缓存，写入和删除时递增集合代号使旧结果失效
+        self._search_cache = SearchCache(config.DATABASE_SEARCH_CACHE_SIZE)
+        
+        # 非持久化模式下每次启动清空集合，持久化模式复用已有集合和索引
+        if not config.MILVUS_PERSISTENT:
+            self.drop_collection(collection_type="evidence")
+            self.drop_collection(collection_type="evaluation_spec")
         # 初始化集合
         self.evidence_collection, self.evaluation_spec_collection = self._setup_collections()
         
         
         
         # 确保索引已创建
-        if not self.evidence_collection.has_index():
-            index_params = {
-                "metric_type": "L2",
-                "index_type": "IVF_FLAT",
-                "params": {"nlist": 128}
-            }
-            self.evidence_collection.create_index(
-                field_name="keywords_embedding",
-                index_params=index_params,
-                index_name="evidence_collection_keywords_index"
-            )
-            self.evidence_collection.create_index(
-                field_name="summary_embedding",
-                index_params=index_params,
-                index_name="evidence_collection_summary_index"
-            )
+        self._ensure_indexes(self.evidence_collection)
+        self._ensure_indexes(self.evaluation_spec_collection)
         
-        if not self.evaluation_spec_collection.has_index():
-            index_params = {
-                "metric_type": "L2",
-                "index_type": "IVF_FLAT",
-                "params": {"nlist": 128}
-            }
-            self.evaluation_spec_collection.create_index(
-                field_name="keywords_embedding",
-                index_params=index_params,
-                index_name="evaluation_spec_collection_keywords_index"
-            )
-            self.evaluation_spec_collection.create_index(
-                field_name="summary_embedding",
-                index_params=index_params,
-                index_name="evaluation_spec_collection_summary_index"
-            )
+        if config.MILVUS_PARTITION_BY_PROJECT:
+            self._partitions.update(partition.name for partition in self.evidence_collection.partitions)
         
-        self.evidence_collection.load()
+        # 按需加载分区时启动阶段释放证明材料集合，之后按项目加载
+        if self._load_on_demand():
+            self.evidence_collection.release()
+        else:
+            self.evidence_collection.load()
         self.evaluation_spec_collection.load()
 
-    def _create_collection(self, name: str) -> Collection:
-        """创建新的Milvus集合"""
+    @staticmethod
+    def _schema(collection_type: str) -> "CollectionSchema":
+        """集合的期望schema：主键、两个向量字段、标量字段和JSON类型的metadata"""
         from pymilvus import FieldSchema, CollectionSchema, DataType
+        vector_type = {
+            "float32": DataType.FLOAT_VECTOR,
+            "float16": DataType.FLOAT16_VECTOR,
+            "bfloat16": DataType.BFLOAT16_VECTOR
+        }[config.VECTOR_DTYPE]
         fields = [
             FieldSchema(name="id", dtype=DataType.VARCHAR, is_primary=True, max_length=64),
-            FieldSchema(name="keywords_embedding", dtype=DataType.FLOAT_VECTOR, dim=int(config.EMBEDDING_DIM)),
-            FieldSchema(name="summary_embedding", dtype=DataType.FLOAT_VECTOR, dim=int(config.EMBEDDING_DIM)),
-            FieldSchema(name="metadata", dtype=DataType.VARCHAR, max_length=65535)
+            FieldSchema(name="keywords_embedding", dtype=vector_type, dim=int(config.EMBEDDING_DIM)),
+            FieldSchema(name="summary_embedding", dtype=vector_type, dim=int(config.EMBEDDING_DIM))
+        ]
+        fields += [
+            FieldSchema(name=name, dtype=DataType.VARCHAR, max_length=max_length)
+            for name, max_length in SCALAR_FIELDS[collection_type].items()
         ]
+        fields.append(FieldSchema(name="metadata", dtype=DataType.JSON))
+        return CollectionSchema(fields, description="")
+
+    @staticmethod
+    def _schema_signature(schema) -> List[Tuple]:
+        """用于比较schema的字段名、类型和向量维度"""
+        return [(field.name, field.dtype, field.params.get("dim")) for field in schema.fields]
+
+    def _create_collection(self, name: str, collection_type: str) -> Collection:
+        """创建新的Milvus集合"""
         print(f"Creating collection {name} with embedding dimension {config.EMBEDDING_DIM}")
-        schema = CollectionSchema(fields, description="")
-        return Collection(name, schema)
+        return Collection(name, self._schema(collection_type), using=self.alias)
+
+    def _ensure_indexes(self, collection: Collection) -> None:
+        """为两个向量字段创建或重建索引，使其与配置的索引类型和参数一致
+        
+        集合上存在多个索引时has_index()必须指定索引名，因此按字段逐个检查。
+        """
+        index_params = {
+            "metric_type": config.MILVUS_METRIC_TYPE,
+            "index_type": config.MILVUS_INDEX_TYPE,
+            "params": config.MILVUS_INDEX_PARAMS
+        }
+        for field_name in ("keywords_embedding", "summary_embedding"):
+            index_name = f"{collection.name}_{field_name.split('_')[0]}_index"
+            if collection.has_index(index_name=index_name):
+                if self._index_matches(collection, index_name, index_params):
+                    continue
+                print(f"Rebuilding index {index_name} as {config.MILVUS_INDEX_TYPE}")
+                collection.release()
+                collection.drop_index(index_name=index_name)
+            else:
+                print(f"Creating index {index_name}")
+            collection.create_index(
+                field_name=field_name,
+                index_params=index_params,
+                index_name=index_name
+            )
+
+    @staticmethod
+    def _index_matches(collection: Collection, index_name: str, index_params: Dict[str, Any]) -> bool:
+        """检查已有索引的类型、度量和构建参数是否与期望一致"""
+        existing = dict(collection.index(index_name=index_name).params)
+        # 不同版本的Milvus返回的参数可能嵌套在params中，且取值为字符串
+        nested = existing.pop("params", {})
+        if isinstance(nested, str):
+            nested = json.loads(nested)
+        existing.update(nested)
+        expected = {
+            "index_type": index_params["index_type"],
+            "metric_type": index_params["metric_type"],
+            **index_params["params"]
+        }
+        return all(str(existing.get(key)) == str(value) for key, value in expected.items())
+
+    @staticmethod
+    def _search_params(overrides: Optional[Dict[str, Any]] = None, top_k: int = 10) -> Dict[str, Any]:
+        """生成检索参数，overrides可覆盖配置中的nprobe/ef等参数"""
+        params = {**config.MILVUS_SEARCH_PARAMS, **(overrides or {})}
+        # HNSW要求ef不小于返回数量
+        if config.MILVUS_INDEX_TYPE == "HNSW" and "ef" in params:
+            params["ef"] = max(int(params["ef"]), top_k)
+        return {"metric_type": config.MILVUS_METRIC_TYPE, "params": params}
 
     def _setup_collections(self) -> Tuple[Collection, Collection]:
         """初始化Milvus集合（证明材料和评估规范）"""
-        def _init_collection(name: str) -> Collection:
-            if utility.has_collection(name):
+        def _init_collection(collection_type: str) -> Collection:
+            name = COLLECTION_NAMES[collection_type]
+            if utility.has_collection(name, using=self.alias):
                 print(f"{name} exists")
-                collection = Collection(name)
-                # 确保索引存在
-                if not collection.has_index():
-                    print(f"Creating index for {name}")
-                    index_params = {
-                        "metric_type": "L2",
-                        "index_type": "IVF_FLAT",
-                        "params": {"nlist": 128}
-                    }
-                    collection.create_index(
-                        field_name="keywords_embedding", 
-                        index_params=index_params,
-                        index_name=f"{name}_keywords_index"
-                    )
-                    collection.create_index(
-                        field_name="summary_embedding", 
-                        index_params=index_params,
-                        index_name=f"{name}_summary_index"
-                    )
-                return collection
+                collection = Collection(name, using=self.alias)
+                if self._schema_signature(collection.schema) == self._schema_signature(self._schema(collection_type)):
+                    return collection
+                # 旧版本的集合schema不一致时删除重建，数据由管理器重新写入
+                print(f"{name} schema mismatch, recreating")
+                utility.drop_collection(name, using=self.alias)
             print(f"Creating new {name}")
-            return self._create_collection(name)
+            return self._create_collection(name, collection_type)
             
-        return _init_collection("evidence_collection"), _init_collection("evaluation_spec_collection")
+        return _init_collection("evidence"), _init_collection("evaluation_spec")
+
+    @staticmethod
+    def _record_metadata(record: Dict[str, Any]) -> Dict[str, Any]:
+        metadata = record.get("metadata") or {}
+        return json.loads(metadata) if isinstance(metadata, str) else dict(metadata)
+
+    def _partition_groups(self, records: List[Dict[str, Any]], collection_type: str) -> Dict[Optional[str], List[Dict[str, Any]]]:
+        """按目标分区对记录分组，未启用分区时全部写入默认分区"""
+        if collection_type != "evidence" or not config.MILVUS_PARTITION_BY_PROJECT:
+            return {None: records}
+        groups: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        for record in records:
+            project = self._record_metadata(record).get("project") or ""
+            groups.setdefault(self._ensure_partition(project), []).append(record)
+        return groups
+
+    def _columns(self, records: List[Dict[str, Any]], collection_type: str) -> Tuple[List[str], List[List[Any]]]:
+        """将记录转换为按schema顺序排列的列数据
+        
+        记录的metadata可以是字典或JSON字符串，其中的标量字段拆分到对应列，其余属性写入JSON字段。
+        标量值超出列长度时列中写入截断后的值用于过滤，完整值仍保留在JSON字段中，读取时以JSON中的值为准。
+        """
+        scalar_fields = SCALAR_FIELDS[collection_type]
+        ids, scalars, metadatas = [], {name: [] for name in scalar_fields}, []
+        for record in records:
+            ids.append(record_id(record))
+            metadata = self._record_metadata(record)
+            for name, max_length in scalar_fields.items():
+                value = metadata.pop(name, "")
+                value = "" if value is None else str(value)
+                truncated = _truncate_utf8(value, max_length)
+                if truncated is not None:
+                    logger.warning("%s记录%s的字段%s超过%d字节，列中只保存截断值，完整值保存在metadata中",
+                                   collection_type, ids[-1], name, max_length)
+                    metadata[name] = value
+                    value = truncated
+                scalars[name].append(value)
+            metadatas.append(metadata)
+        columns = [
+            ids,
+            [to_storage(record["keywords_embedding"], config.VECTOR_DTYPE) for record in records],
+            [to_storage(record["summary_embedding"], config.VECTOR_DTYPE) for record in records],
+            *scalars.values(),
+            metadatas
+        ]
+        return ids, columns
 
     def store_data(self, data: Dict[str, Any], collection_type: str = "evidence") -> str:
-        """存储数据到Milvus
+        """按ID覆盖写入数据到Milvus，相同ID的记录只保留最新一条
         
         Args:
-            data: 要存储的数据字典
+            data: 要存储的数据字典，包含id、两个向量字段和metadata；未指定id时按内容计算
             collection_type: 集合类型，可选值为"evidence"或"evaluation_spec"
         """
-        # 准备数据
-        data_id = data.get('id', str(uuid.uuid4()))
-        keywords_embedding = data["keywords_embedding"]
-        summary_embedding = data["summary_embedding"]
-        metadata = data.get("metadata", "")
+        data = {**data, "id": record_id(data)}
+        for partition_name, records in self._partition_groups([data], collection_type).items():
+            _, columns = self._columns(records, collection_type)
+            self._collection(collection_type).upsert(columns, partition_name=partition_name)
+        # 先递增代号再使回表缓存失效，与hydrate写缓存前的代号检查配合
+        self._search_cache.bump(collection_type)
+        self._hydrated[collection_type].pop(data["id"])
+        return data["id"]
+               
+    def store_data_batch(self, records: List[Dict[str, Any]], collection_type: str = "evidence",
+                         batch_size: Optional[int] = None) -> List[str]:
+        """按列批量覆盖写入数据到Milvus，全部写入后统一flush一次
         
-        entities = [[data_id], [keywords_embedding], [summary_embedding], [metadata]]
+        写入以ID为键upsert，重复写入相同内容不会产生重复记录；同一批次内ID重复时以最后一条为准。
         
-        # 根据collection_type选择目标集合
-        if collection_type == "evidence":
-            self.evidence_collection.insert(entities)
-        elif collection_type == "evaluation_spec":
-            self.evaluation_spec_collection.insert(entities)
-        else:
-            raise ValueError(f"无效的collection_type: {collection_type}")
+        Args:
+            records: 数据字典列表，字段与store_data相同
+            collection_type: 集合类型，可选值为"evidence"或"evaluation_spec"
+            batch_size: 每次upsert请求的行数，默认取MILVUS_INSERT_BATCH_SIZE
+            
+        Returns:
+            存储数据的ID列表，与输入顺序一致
+        """
+        collection = self._collection(collection_type)
+        batch_size = batch_size or config.MILVUS_INSERT_BATCH_SIZE
         
-        return data_id
+        records = [{**record, "id": record_id(record)} for record in records]
+        unique = list({record["id"]: record for record in records}.values())
+        unique_ids = [record["id"] for record in unique]
+        for partition_name, partition_records in self._partition_groups(unique, collection_type).items():
+            for start in range(0, len(partition_records), batch_size):
+                _, columns = self._columns(partition_records[start:start + batch_size], collection_type)
+                collection.upsert(columns, partition_name=partition_name)
+        
+        if records:
+            collection.flush()
+        if records:
+            self._search_cache.bump(collection_type)
+        for data_id in unique_ids:
+            self._hydrated[collection_type].pop(data_id)
+        return [record["id"] for record in records]
                
-    def search_data(self, query: Dict[str, Any], collection_type: str = "evidence", top_k: int = 10) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _load_on_demand() -> bool:
+        return config.MILVUS_PARTITION_BY_PROJECT and config.MILVUS_MAX_LOADED_PARTITIONS > 0
+
+    @staticmethod
+    def partition_name(project: str) -> str:
+        """项目对应的分区名，分区名只允许字母数字下划线，因此使用项目名哈希"""
+        return "p_" + hashlib.sha1(project.encode("utf-8")).hexdigest()[:24]
+
+    def _ensure_partition(self, project: str) -> str:
+        """确保项目分区存在，返回分区名"""
+        name = self.partition_name(project)
+        with self._partition_lock:
+            if name not in self._partitions:
+                if not self.evidence_collection.has_partition(name):
+                    self.evidence_collection.create_partition(name, description=project)
+                self._partitions.add(name)
+                self._all_partitions_loaded = False
+        return name
+
+    def _load_partition(self, name: str) -> None:
+        """按需加载分区，超出上限时释放最久未使用的分区"""
+        if not self._load_on_demand():
+            return
+        with self._partition_lock:
+            if name in self._loaded_partitions:
+                self._loaded_partitions.move_to_end(name)
+                if not self._all_partitions_loaded:
+                    return
+            else:
+                self.evidence_collection.load(partition_names=[name])
+                self._loaded_partitions[name] = None
+            # 全量加载过后，回到只保留最近使用的分区
+            self._all_partitions_loaded = False
+            while len(self._loaded_partitions) > config.MILVUS_MAX_LOADED_PARTITIONS:
+                released, _ = self._loaded_partitions.popitem(last=False)
+                self.evidence_collection.partition(released).release()
+                print(f"Released partition {released}")
+
+    def _load_all_partitions(self) -> None:
+        """跨项目的检索和查询需要加载全部分区"""
+        if not self._load_on_demand():
+            return
+        with self._partition_lock:
+            if self._all_partitions_loaded:
+                return
+            self.evidence_collection.load()
+            self._loaded_partitions = OrderedDict.fromkeys(name for name in self._partitions if name != "_default")
+            self._all_partitions_loaded = True
+
+    def _scope(self, collection_type: str, project: Optional[str], expr: Optional[str]) -> Tuple[Optional[List[str]], Optional[str]]:
+        """确定检索范围，返回(分区列表, 过滤表达式)；项目分区不存在时分区列表为空列表"""
+        if collection_type != "evidence":
+            return None, expr
+        if project is None:
+            self._load_all_partitions()
+            return None, expr
+        if not config.MILVUS_PARTITION_BY_PROJECT:
+            # 未启用分区时退化为标量字段过滤
+            project_expr = f"project == {json.dumps(project, ensure_ascii=False)}"
+            return None, f"({expr}) and {project_expr}" if expr else project_expr
+        name = self.partition_name(project)
+        if name not in self._partitions and not self.evidence_collection.has_partition(name):
+            return [], expr
+        self._partitions.add(name)
+        self._load_partition(name)
+        return [name], expr
+
+    @staticmethod
+    def _output_fields(collection_type: str, fields: Optional[List[str]] = None) -> List[str]:
+        """检索时需要从Milvus取回的非向量字段
+        
+        fields为metadata中需要的键，None表示全部。只需要标量列时不取JSON字段，
+        例如不需要content时就不会传输和解析长文本。
+        """
+        scalar_fields = SCALAR_FIELDS[collection_type]
+        if fields is None:
+            return ["id", *scalar_fields, "metadata"]
+        output_fields = ["id", *(name for name in scalar_fields if name in fields)]
+        if any(name != "id" and name not in scalar_fields for name in fields):
+            output_fields.append("metadata")
+        return output_fields
+
+    @staticmethod
+    def _project(metadata: Dict[str, Any], fields: Optional[List[str]], data_id: str) -> Dict[str, Any]:
+        """按需要的键裁剪metadata，fields为None时返回全部"""
+        if fields is None:
+            return metadata
+        return {name: data_id if name == "id" else metadata[name] for name in fields if name == "id" or name in metadata}
+
+    @staticmethod
+    def _merge_metadata(item: Dict[str, Any], collection_type: str) -> Dict[str, Any]:
+        """将标量字段合并回metadata，保持与原先整体JSON相同的字典结构
+        
+        超长的标量值在JSON字段中保存了完整值，此时不使用列中的截断值。
+        """
+        metadata = item.get("metadata") or {}
+        if isinstance(metadata, str):
+            metadata = json.loads(metadata)
+        metadata = dict(metadata)
+        for name in SCALAR_FIELDS[collection_type]:
+            if name in item and name not in metadata:
+                metadata[name] = item[name]
+        return metadata
+
+    def _collection(self, collection_type: str) -> Collection:
+        """根据集合类型获取集合对象"""
+        if collection_type == "evidence":
+            return self.evidence_collection
+        elif collection_type == "evaluation_spec":
+            return self.evaluation_spec_collection
+        raise ValueError(f"无效的collection_type: {collection_type}")
+
+    def search_data(self, query: Dict[str, Any], collection_type: str = "evidence", top_k: int = 10,
+                    search_params: Optional[Dict[str, Any]] = None, expr: Optional[str] = None,
+                    project: Optional[str] = None,
+                    output_fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """在指定集合中搜索相似数据
         
         Args:
-            query: 查询字典，可包含keywords_embedding和/或summary_embedding字段
+            query: 查询字典，可包含keywords_embedding和/或summary_embedding字段。
+                两者都有时执行混合检索，可选ranker（"weighted"或"rrf"）、weights（两个字段的权重）和rrf_k
             collection_type: 集合类型，可选值为"evidence"或"evaluation_spec"
             top_k: 返回结果数量
+            search_params: 覆盖默认检索参数，如{"nprobe": 32}或{"ef": 128}
+            expr: 标量字段过滤表达式，在Milvus服务端执行，如 'evidence_type == "财务报告"'
+            project: 只检索该项目的证明材料（仅对evidence集合有效），启用分区时只搜索对应分区
+            output_fields: 结果metadata中需要的键，如["filename", "summary"]；None返回全部，
+                空列表只返回id和score，之后可用hydrate按需回表
             
         Returns:
-            包含匹配结果及其metadata的列表
+            包含匹配结果及其metadata的列表。单字段检索的score为距离，混合检索的score为融合得分（越大越相似）
         """
+        return self.batch_search_data([query], collection_type, top_k, search_params=search_params, expr=expr,
+                                      project=project, output_fields=output_fields)[0]
+
+    @staticmethod
+    def _ranker(query: Dict[str, Any]) -> Tuple:
+        """解析混合检索的融合方式，返回可作为分组键的元组"""
+        if query.get("ranker", "weighted") == "rrf":
+            return ("rrf", int(query.get("rrf_k", 60)))
+        weights = query.get("weights", [0.5, 0.5])  # 默认权重
+        if len(weights) != 2:
+            weights = [0.5, 0.5]  # 重置为默认权重
+        return ("weighted", float(weights[0]), float(weights[1]))
+
+    @staticmethod
+    def _query_vectors(queries: List[Dict[str, Any]], indices: List[int], field: str) -> List[np.ndarray]:
+        """取出指定查询的某个向量字段，转换为与集合一致的存储精度"""
+        return [to_storage(queries[i][field], config.VECTOR_DTYPE) for i in indices]
+
+    def batch_search_data(self, queries: List[Dict[str, Any]], collection_type: str = "evidence",
+                          top_k: int = 10, batch_size: int = 1024,
+                          search_params: Optional[Dict[str, Any]] = None,
+                          expr: Optional[str] = None,
+                          project: Optional[str] = None,
+                          output_fields: Optional[List[str]] = None) -> List[List[Dict[str, Any]]]:
+        """批量搜索，检索方式相同的多个查询在一次请求中发送
         
-    
-        # 获取目标集合
-        if collection_type == "evidence":
-            collection = self.evidence_collection
-        elif collection_type == "evaluation_spec":
-            collection = self.evaluation_spec_collection
-        else:
-            raise ValueError(f"无效的collection_type: {collection_type}")
+        Args:
+            queries: 查询字典列表，格式同search_data。只含一个向量字段的查询走普通检索，
+                同时包含两个字段的查询走服务端融合的混合检索
+            collection_type: 集合类型，可选值为"evidence"或"evaluation_spec"
+            top_k: 每个查询返回的结果数量
+            batch_size: 每次请求携带的最大查询数
+            search_params: 覆盖默认检索参数，如{"nprobe": 32}或{"ef": 128}
+            expr: 标量字段过滤表达式，对所有查询生效
+            project: 只检索该项目的证明材料（仅对evidence集合有效）
+            output_fields: 结果metadata中需要的键，None返回全部，空列表只返回id和score
             
-        # 检查查询向量
-        has_keywords = "keywords_embedding" in query
-        has_summary = "summary_embedding" in query
+        Returns:
+            与queries一一对应的结果列表，每个元素是该查询的匹配结果及其metadata
+        """
+        # 缓存命中的查询只需按ID回表（经过回表缓存），未命中的查询合并后发送；
+        # 缓存中只有id和score，output_fields不影响命中
+        options = (top_k, json.dumps(search_params, sort_keys=True, default=str), expr, project)
+        return self._search_cache.search(
+            collection_type, queries, options,
+            lambda missing: self._batch_search(missing, collection_type, top_k, batch_size, search_params,
+                                               expr, project, output_fields),
+            lambda ids: self.hydrate(ids, collection_type, fields=output_fields, project=project)
+        )
+
+    def _batch_search(self, queries: List[Dict[str, Any]], collection_type: str, top_k: int, batch_size: int,
+                      search_params: Optional[Dict[str, Any]], expr: Optional[str], project: Optional[str],
+                      output_fields: Optional[List[str]]) -> List[List[Dict[str, Any]]]:
+        """执行批量检索，不经过结果缓存"""
+        collection = self._collection(collection_type)
+        search_params = self._search_params(search_params, top_k)
+        fields = output_fields
+        output_fields = self._output_fields(collection_type, fields)
+        partition_names, expr = self._scope(collection_type, project, expr)
+        if partition_names == []:
+            return [[] for _ in queries]
+        
+        # 按检索方式分组，每组一次请求
+        groups: Dict[Tuple, List[int]] = {}
+        for index, query in enumerate(queries):
+            has_keywords = "keywords_embedding" in query
+            has_summary = "summary_embedding" in query
+            if has_keywords and has_summary:
+                key = ("hybrid",) + self._ranker(query)
+            elif has_keywords or has_summary:
+                key = ("keywords_embedding" if has_keywords else "summary_embedding",)
+            else:
+                raise ValueError("查询中必须包含keywords_embedding或summary_embedding字段")
+            groups.setdefault(key, []).append(index)
+        
+        results: List[List[Dict[str, Any]]] = [[] for _ in queries]
+        for key, indices in groups.items():
+            for start in range(0, len(indices), batch_size):
+                chunk = indices[start:start + batch_size]
+                if key[0] == "hybrid":
+                    # 两个向量字段各自召回后由服务端融合排序，一次请求完成
+                    rerank = RRFRanker(key[2]) if key[1] == "rrf" else WeightedRanker(key[2], key[3])
+                    hits_list = collection.hybrid_search(
+                        reqs=[
+                            AnnSearchRequest(self._query_vectors(queries, chunk, "keywords_embedding"), "keywords_embedding", search_params, top_k, expr=expr),
+                            AnnSearchRequest(self._query_vectors(queries, chunk, "summary_embedding"), "summary_embedding", search_params, top_k, expr=expr)
+                        ],
+                        rerank=rerank,
+                        limit=top_k,
+                        partition_names=partition_names,
+                        output_fields=output_fields
+                    )
+                else:
+                    hits_list = collection.search(
+                        data=self._query_vectors(queries, chunk, key[0]),
+                        anns_field=key[0],
+                        param=search_params,
+                        limit=top_k,
+                        expr=expr,
+                        partition_names=partition_names,
+                        output_fields=output_fields
+                    )
+                for index, hits in zip(chunk, hits_list):
+                    results[index] = [
+                        {
+                            "id": hit.id,
+                            "metadata": self._project(
+                                self._merge_metadata({name: hit.entity.get(name) for name in output_fields}, collection_type),
+                                fields, hit.id
+                            ),
+                            "score": hit.score
+                        }
+                        for hit in hits
+                    ]
+        return results
+
+    def existing_ids(self, ids: List[str], collection_type: str = "evidence", batch_size: int = 1000,
+                     project: Optional[str] = None) -> Set[str]:
+        """查询给定ID中已存储在集合中的部分
         
-        if not has_keywords and not has_summary:
-            raise ValueError("查询中必须包含keywords_embedding或summary_embedding字段")
+        Args:
+            ids: 待检查的ID列表
+            collection_type: 集合类型，可选值为"evidence"或"evaluation_spec"
+            batch_size: 每次查询的ID数量
+            project: ID所属的项目（仅对evidence集合有效），启用分区时只加载和查询该项目分区；
+                不指定时加载全部分区
             
-        # 设置搜索参数
-        search_params = {
-            "metric_type": "L2",
-            "params": {"nprobe": 10}
-        }
+        Returns:
+            已存在的ID集合
+        """
+        collection = self._collection(collection_type)
+        partition_names, scope_expr = self._scope(collection_type, project, None)
+        if partition_names == []:
+            return set()
         
-        # 执行单字段或混合搜索
-        if has_keywords and has_summary:
-            # 混合搜索
-            weights = query.get("weights", [0.5, 0.5])  # 默认权重
-            if len(weights) != 2 or sum(weights) != 1.0:
-                weights = [0.5, 0.5]  # 重置为默认权重
-                
-            # 执行混合搜索
-            results = collection.search(
-                data=[query["keywords_embedding"], query["summary_embedding"]],
-                anns_field=["keywords_embedding", "summary_embedding"],
-                param=search_params,
-                limit=top_k,
-                output_fields=["id", "metadata"],
-                expr=None,
-                consistency_level=None,
-                partition_names=None,
-                round_decimal=-1,
-                weight=weights
+        found = set()
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            id_expr = f"id in {json.dumps(batch)}"
+            results = collection.query(
+                expr=f"({id_expr}) and {scope_expr}" if scope_expr else id_expr,
+                output_fields=["id"],
+                partition_names=partition_names,
+                consistency_level="Strong"
             )
-        else:
-            # 单字段搜索
-            search_field = "keywords_embedding" if has_keywords else "summary_embedding"
-            search_vector = query[search_field]
+            found.update(item["id"] for item in results)
+        return found
+
+    def hydrate(self, ids: List[str], collection_type: str = "evidence", fields: Optional[List[str]] = None,
+                batch_size: int = 1000, project: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """按ID批量取回记录的metadata，已取回的记录缓存在LRU中
+        
+        Args:
+            ids: 记录ID列表，可包含重复ID
+            collection_type: 集合类型，可选值为"evidence"或"evaluation_spec"
+            fields: 需要的metadata键，None返回全部；只取回需要的列，缓存的记录包含这些键时直接命中
+            batch_size: 每次查询的ID数量
+            project: ID所属的项目（仅对evidence集合有效），启用分区时只加载和查询该项目分区；
+                不指定时加载全部分区
             
-            results = collection.search(
-                data=[search_vector],
-                anns_field=search_field,
-                param=search_params,
-                limit=top_k,
-                output_fields=["id", "metadata"]
-            )
+        Returns:
+            ID到metadata的映射，不存在的ID不包含在内
+        """
+        cache = self._hydrated[collection_type]
+        # 缓存值为(包含的键, metadata)，包含的键为None表示完整记录
+        covered = None if fields is None else frozenset(fields)
+        found: Dict[str, Dict[str, Any]] = {}
+        missing = []
+        for data_id in dict.fromkeys(ids):
+            entry = cache.get(data_id)
+            if entry is not None and (entry[0] is None or (covered is not None and covered <= entry[0])):
+                found[data_id] = entry[1]
+            else:
+                missing.append(data_id)
         
-        # 格式化结果
-        return [{"id": hit.id, "metadata": json.loads(hit.entity.get("metadata")), "score": hit.score} 
-                for hit in results[0]]
+        partition_names, scope_expr = self._scope(collection_type, project, None) if missing else (None, None)
+        if missing and partition_names != []:
+            collection = self._collection(collection_type)
+            # 查询前记录写入代号，查询期间有写入或删除时不把结果写入缓存
+            generation = self._search_cache.generation(collection_type)
+
+            def valid() -> bool:
+                return self._search_cache.generation(collection_type) == generation
 
-    
-    def dump(self, collection_type: str = "evidence", limit: int = 1000) -> List[Dict[str, Any]]:
+            for start in range(0, len(missing), batch_size):
+                batch = missing[start:start + batch_size]
+                id_expr = f"id in {json.dumps(batch, ensure_ascii=False)}"
+                for item in collection.query(
+                    expr=f"({id_expr}) and {scope_expr}" if scope_expr else id_expr,
+                    output_fields=self._output_fields(collection_type, fields),
+                    partition_names=partition_names,
+                    consistency_level="Strong"
+                ):
+                    metadata = self._project(self._merge_metadata(item, collection_type), fields, item["id"])
+                    cache.put(item["id"], (covered, metadata), valid=valid)
+                    found[item["id"]] = metadata
+        # 返回副本，调用方修改结果不会影响缓存
+        return {data_id: dict(self._project(metadata, fields, data_id)) for data_id, metadata in found.items()}
+
+    def iter_dump(self, collection_type: str = "evidence", batch_size: Optional[int] = None,
+                  output_fields: Optional[List[str]] = None, expr: str = "",
+                  project: Optional[str] = None) -> Iterator[List[Dict[str, Any]]]:
+        """使用查询迭代器分页导出集合数据，内存占用只与批大小有关
+        
+        Args:
+            collection_type: 集合类型，可选值为"evidence"或"evaluation_spec"
+            batch_size: 每页记录数，默认取MILVUS_QUERY_BATCH_SIZE
+            output_fields: 返回的字段，默认全部字段；不需要向量时可只取["id", "metadata"]
+            expr: 过滤表达式，默认导出全部数据
+            project: 只导出该项目的证明材料（仅对evidence集合有效），不指定时加载全部分区
+            
+        Yields:
+            每页的记录列表
+        """
+        collection = self._collection(collection_type)
+        partition_names, expr = self._scope(collection_type, project, expr)
+        if partition_names == []:
+            return
+        output_fields = list(output_fields or ["id", "keywords_embedding", "summary_embedding", "metadata"])
+        if "metadata" in output_fields:
+            # metadata由标量字段和JSON字段共同组成
+            output_fields += [name for name in SCALAR_FIELDS[collection_type] if name not in output_fields]
+        iterator = collection.query_iterator(
+            batch_size=batch_size or config.MILVUS_QUERY_BATCH_SIZE,
+            expr=expr or "",
+            output_fields=output_fields,
+            partition_names=partition_names
+        )
+        try:
+            while True:
+                page = iterator.next()
+                if not page:
+                    break
+                yield [self._format_record(item, collection_type) for item in page]
+        finally:
+            iterator.close()
+
+    def _format_record(self, item: Dict[str, Any], collection_type: str) -> Dict[str, Any]:
+        """将查询结果转换为记录字典，向量转为float32数组，标量字段合并到metadata中"""
+        record = {"id": item["id"]}
+        for field in ("keywords_embedding", "summary_embedding"):
+            if field in item:
+                record[field] = to_float32(item[field], config.VECTOR_DTYPE)
+        if "metadata" in item:
+            record["metadata"] = self._merge_metadata(item, collection_type)
+        return record
+
+    def dump(self, collection_type: str = "evidence", limit: Optional[int] = None,
+             output_fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """导出指定集合中的数据
         
         Args:
             collection_type: 集合类型，可选值为"evidence"或"evaluation_spec"
-            limit: 最大返回记录数，默认为1000
+            limit: 最大返回记录数，默认不限制
+            output_fields: 返回的字段，默认全部字段
             
         Returns:
             包含集合中所有文档的列表
         """
-        # 获取目标集合
-        if collection_type == "evidence":
-            collection = self.evidence_collection
-        elif collection_type == "evaluation_spec":
-            collection = self.evaluation_spec_collection
-        else:
-            raise ValueError(f"无效的collection_type: {collection_type}")
-            
-        # 查询数据
-        results = collection.query(
-            expr="",
-            output_fields=["id", "keywords_embedding", "summary_embedding", "metadata"],
-            limit=limit
-        )
+        records = (record for page in self.iter_dump(collection_type, output_fields=output_fields) for record in page)
+        return list(itertools.islice(records, limit))
         
-        # 格式化结果
-        return [{
-            "id": item["id"],
-            "keywords_embedding": item["keywords_embedding"],
-            "summary_embedding": item["summary_embedding"],
-            "metadata": json.loads(item["metadata"]) if item["metadata"] else {}
-        } for item in results]
+    def delete_by_ids(self, ids: List[str], collection_type: str = "evidence", batch_size: int = 1000) -> int:
+        """按ID删除数据
         
+        Args:
+            ids: 待删除的ID列表
+            collection_type: 集合类型，可选值为"evidence"或"evaluation_spec"
+            batch_size: 每次删除请求的ID数量
+            
+        Returns:
+            删除的记录数
+        """
+        collection = self._collection(collection_type)
+        deleted = 0
+        for start in range(0, len(ids), batch_size):
+            batch = list(ids[start:start + batch_size])
+            deleted += collection.delete(expr=f"id in {json.dumps(batch, ensure_ascii=False)}").delete_count
+            self._search_cache.bump(collection_type)
+            for data_id in batch:
+                self._hydrated[collection_type].pop(data_id)
+        return deleted
+
+    def delete_by_filter(self, expr: str, collection_type: str = "evidence", project: Optional[str] = None) -> int:
+        """删除满足过滤表达式的数据
+        
+        Args:
+            expr: 过滤表达式，如 'evidence_type == "财务报告"'，可使用id和标量字段
+            collection_type: 集合类型，可选值为"evidence"或"evaluation_spec"
+            project: 只删除该项目的证明材料（仅对evidence集合有效），启用分区时只加载该项目分区；
+                不指定时加载全部分区
+            
+        Returns:
+            删除的记录数
+        """
+        if not expr or not expr.strip():
+            raise ValueError("删除过滤表达式不能为空，清空集合请使用delete_all_data")
+        collection = self._collection(collection_type)
+        partition_names, expr = self._scope(collection_type, project, expr)
+        if partition_names == []:
+            return 0
+        deleted = collection.delete(expr=expr, partition_name=partition_names[0] if partition_names else None).delete_count
+        self._search_cache.bump(collection_type)
+        self._hydrated[collection_type].clear()
+        return deleted
+
     def delete_all_data(self, collection_type: str = "evidence") -> None:
         """删除指定集合中的所有数据
         
         Args:
             collection_type: 集合类型，可选值为"evidence"或"evaluation_spec"
         """
-        # 获取目标集合
-        if collection_type == "evidence":
-            collection = self.evidence_collection
-        elif collection_type == "evaluation_spec":
-            collection = self.evaluation_spec_collection
-        else:
-            raise ValueError(f"无效的collection_type: {collection_type}")
-            
-        # 删除所有数据
-        collection.delete(expr="id in [\"\"]")
+        self.delete_by_filter('id != ""', collection_type)
         
     def drop_collection(self, collection_type: str = "evidence") -> None:
         """彻底删除指定集合，包括数据结构和所有数据
@@ -276,8 +761,26 @@ class Database:
             raise ValueError(f"无效的collection_type: {collection_type}")
             
         # 检查集合是否存在
-        if utility.has_collection(collection_name):
-            utility.drop_collection(collection_name)
+        if utility.has_collection(collection_name, using=self.alias):
+            utility.drop_collection(collection_name, using=self.alias)
             print(f"已删除集合 {collection_name}")
+            self._search_cache.bump(collection_type)
+            self._hydrated[collection_type].clear()
+            if collection_type == "evidence":
+                self._partitions.clear()
+                self._loaded_partitions.clear()
+                self._all_partitions_loaded = False
         else:
             print(f"集合 {collection_name} 不存在，无需删除")
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """返回检索结果缓存和回表缓存的命中统计"""
+        return {
+            "search": self._search_cache.stats(),
+            "hydrate": {collection_type: cache.stats() for collection_type, cache in self._hydrated.items()}
+        }
+
+    def close(self) -> None:
+        """断开当前进程的Milvus连接"""
+        connections.disconnect(self.alias)
+        print("Milvus connection closed")
@@ -1,28 +1,47 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Optional, Set
 
-import uuid
-import json
+from .records import content_id
 
-from .database import Database
+# 未指定ID时用于计算内容哈希的标识字段
+SPEC_IDENTITY_FIELDS = ('primary_title', 'secondary_title', 'tertiary_title', 'content', 'evaluation_guidelines')
 
-def store_evaluation_spec(database, spec: Dict[str, Any]) -> str:
-    """存储评估规范"""
-    spec_id = str(uuid.uuid4())
-    spec_data = {
-        'id': spec_id,
+
+def _spec_record(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """将评估规范字典转换为数据库记录"""
+    # 向量单独存储在向量字段中；标量字段由数据库拆分到独立列，其余属性存入JSON字段
+    metadata = {k: v for k, v in spec.items() if k not in ('keywords_embedding', 'summary_embedding')}
+    metadata['id'] = spec.get('id') or content_id(spec.get(field) for field in SPEC_IDENTITY_FIELDS)
+    return {
+        'id': metadata['id'],
         'keywords_embedding': spec.get('keywords_embedding'),
         'summary_embedding': spec.get('summary_embedding'),
-        'metadata': json.dumps(spec)
+        'metadata': metadata
     }
-    return database.store_data(spec_data, collection_type="evaluation_spec")
+
+def store_evaluation_spec(database, spec: Dict[str, Any]) -> str:
+    """存储评估规范"""
+    return database.store_data(_spec_record(spec), collection_type="evaluation_spec")
+
+def store_evaluation_specs(database, specs: List[Dict[str, Any]], batch_size: Optional[int] = None) -> List[str]:
+    """批量存储评估规范
+    
+    Args:
+        specs: 评估规范字典列表
+        batch_size: 每次insert请求的行数，默认取配置值
+        
+    Returns:
+        存储的评估规范ID列表
+    """
+    return database.store_data_batch([_spec_record(spec) for spec in specs], collection_type="evaluation_spec", batch_size=batch_size)
         
-def search_evaluation_spec(database, query: Dict[str, Any], top_k: int = 10) -> List[Dict[str, Any]]:
+def search_evaluation_spec(database, query: Dict[str, Any], top_k: int = 10, expr: Optional[str] = None) -> List[Dict[str, Any]]:
     """
     搜索评估规范
     
     Args:
         query: 查询字典，可包含keywords_embedding和/或summary_embedding字段
         top_k: 返回的结果数量
+        expr: 标量字段过滤表达式，如 'primary_title == "安全管理"'
         
     Returns:
         匹配的评估规范列表
@@ -30,48 +49,76 @@ def search_evaluation_spec(database, query: Dict[str, Any], top_k: int = 10) ->
     if 'keywords_embedding' not in query and 'summary_embedding' not in query:
         return []
         
-    # 组合查询向量，默认权重为keywords:0.7, summary:0.3
-    combined_embedding = [
-        0.7 * x + 0.3 * y
-        for x, y in zip(
-            query.get('keywords_embedding', [0]*len(query.get('summary_embedding', []))),
-            query.get('summary_embedding', [0]*len(query.get('keywords_embedding', [])))
-        )
-    ]
-    return database.search_data(query = query, collection_type="evaluation_spec", top_k = top_k)
+    # 同时包含两个向量时执行混合检索，默认权重为keywords:0.7, summary:0.3
+    if 'keywords_embedding' in query and 'summary_embedding' in query and 'weights' not in query:
+        query = {**query, 'weights': [0.7, 0.3]}
+    return database.search_data(query = query, collection_type="evaluation_spec", top_k = top_k, expr = expr)
     
-def batch_search_evaluation_spec(database, queries: List[Dict[str, Any]], top_k: int = 10) -> List[List[Dict[str, Any]]]:
+def batch_search_evaluation_spec(database, queries: List[Dict[str, Any]], top_k: int = 10, expr: Optional[str] = None) -> List[List[Dict[str, Any]]]:
     """
     批量搜索评估规范
     
     Args:
         queries: 查询字典列表，每个字典可包含keywords_embedding和/或summary_embedding字段
         top_k: 每个查询返回的结果数量
+        expr: 标量字段过滤表达式，对所有查询生效
         
     Returns:
         包含多个查询结果的列表，每个元素是对应查询的结果列表
     """
-    return [search_evaluation_spec(query, top_k) for query in queries]
+    return database.batch_search_data(queries, collection_type="evaluation_spec", top_k=top_k, expr=expr)
+
+def _retrieval_query(spec: Dict, summary_weight: float, keywords_weight: float) -> Dict[str, Any]:
+    """构建召回查询，规范同时有两个向量时使用加权混合检索"""
+    query = {"keywords_embedding": spec["keywords_embedding"]}
+    if spec.get("summary_embedding") is not None:
+        query["summary_embedding"] = spec["summary_embedding"]
+        query["weights"] = [keywords_weight, summary_weight]
+    return query
 
 def retrieve_evidence_by_spec(database, spec: Dict, 
                                 summary_weight: float = 0.3, 
                                 keywords_weight: float = 0.7,
-                                top_k: int = 5) -> list:
-    """根据评估规范召回证明材料"""
+                                top_k: int = 5,
+                                expr: Optional[str] = None,
+                                project: Optional[str] = None,
+                                output_fields: Optional[List[str]] = None) -> list:
+    """根据评估规范召回证明材料，关键词和摘要向量在服务端加权融合
+    
+    expr可限定证明材料范围，project指定时只检索该项目的分区，output_fields为证明材料中需要的字段（None返回全部）
+    """
     try:
-        # 获取评估规范的向量
-        
-        query = {
-            "keywords_embedding": spec["keywords_embedding"]
-        }
-        
-        evideces = database.search_data(query = query, collection_type = "evidence", top_k = top_k)
+        query = _retrieval_query(spec, summary_weight, keywords_weight)
+        evideces = database.search_data(query = query, collection_type = "evidence", top_k = top_k, expr = expr, project = project,
+                                        output_fields = output_fields)
         
         return evideces
     except Exception as e:
         print(f"Error retrieving evidence for spec: {str(e)}")
         return []
         
+def retrieve_evidence_by_specs(database, specs: List[Dict],
+                                summary_weight: float = 0.3,
+                                keywords_weight: float = 0.7,
+                                top_k: int = 5,
+                                expr: Optional[str] = None,
+                                project: Optional[str] = None,
+                                output_fields: Optional[List[str]] = None) -> List[list]:
+    """根据多个评估规范批量召回证明材料，所有查询在一次检索请求中完成，project指定时只检索该项目的分区
+    
+    output_fields为空列表时只返回id和score，可再用hydrate_evidences对去重后的ID统一回表
+    
+    Returns:
+        与specs一一对应的证明材料列表
+    """
+    try:
+        queries = [_retrieval_query(spec, summary_weight, keywords_weight) for spec in specs]
+        return database.batch_search_data(queries, collection_type = "evidence", top_k = top_k, expr = expr, project = project,
+                                          output_fields = output_fields)
+    except Exception as e:
+        print(f"Error retrieving evidence for specs: {str(e)}")
+        return [[] for _ in specs]
+        
 def dump_evaluation_spec(database) -> List[Dict[str, Any]]:
     """
     获取所有评估规范数据
@@ -80,4 +127,41 @@ def dump_evaluation_spec(database) -> List[Dict[str, Any]]:
         包含所有评估规范的列表
     """
     return database.dump(collection_type = "evaluation_spec")
+
+
+def hydrate_evaluation_specs(database, ids: List[str], fields: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    按ID批量取回评估规范
+    
+    Args:
+        ids: 评估规范ID列表
+        fields: 需要的字段，None返回全部
         
+    Returns:
+        ID到评估规范字典的映射
+    """
+    return database.hydrate(ids, collection_type="evaluation_spec", fields=fields)
+
+
+def iter_dump_evaluation_spec(database, batch_size: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+    """
+    分页获取所有评估规范数据
+    
+    Args:
+        batch_size: 每页记录数，默认取配置值
+        
+    Yields:
+        每页的评估规范列表
+    """
+    return database.iter_dump(collection_type = "evaluation_spec", batch_size = batch_size)
+        
+
+
+def stored_evaluation_spec_ids(database) -> Set[str]:
+    """
+    获取已存储的评估规范ID，只读取id字段
+    
+    Returns:
+        评估规范ID集合
+    """
+    return {record["id"] for page in database.iter_dump(collection_type="evaluation_spec", output_fields=["id"]) for record in page}
@@ -1,29 +1,51 @@
-from typing import Dict, Any, List
-import uuid
-import json
+from typing import Dict, Any, List, Optional, Set
+from .records import content_id
+
+# 未指定ID时用于计算内容哈希的标识字段
+EVIDENCE_IDENTITY_FIELDS = ('filename', 'file_format', 'collector', 'project', 'evidence_type', 'content')
 
-from .database import Database
 
 
     
-def store_evidence(database, evidence: Dict[str, Any]) -> str:
-    """存储证明材料"""
-    evidence_id = str(uuid.uuid4())
-    evidence_data = {
-        'id': evidence_id,
+def _evidence_record(evidence: Dict[str, Any]) -> Dict[str, Any]:
+    """将证明材料字典转换为数据库记录"""
+    # 向量单独存储在向量字段中；标量字段由数据库拆分到独立列，其余属性存入JSON字段
+    metadata = {k: v for k, v in evidence.items() if k not in ('keywords_embedding', 'summary_embedding')}
+    metadata['id'] = evidence.get('id') or content_id(evidence.get(field) for field in EVIDENCE_IDENTITY_FIELDS)
+    return {
+        'id': metadata['id'],
         'keywords_embedding': evidence.get('keywords_embedding'),
         'summary_embedding': evidence.get('summary_embedding'),
-        'metadata': json.dumps(evidence)
+        'metadata': metadata
     }
-    return database.store_data(evidence_data, collection_type="evidence")
+
+def store_evidence(database, evidence: Dict[str, Any]) -> str:
+    """存储证明材料"""
+    return database.store_data(_evidence_record(evidence), collection_type="evidence")
+
+def store_evidences(database, evidences: List[Dict[str, Any]], batch_size: Optional[int] = None) -> List[str]:
+    """批量存储证明材料
     
-def search_evidence(database, query: Dict[str, Any], top_k: int = 10) -> List[Dict[str, Any]]:
+    Args:
+        evidences: 证明材料字典列表
+        batch_size: 每次insert请求的行数，默认取配置值
+        
+    Returns:
+        存储的证明材料ID列表
+    """
+    return database.store_data_batch([_evidence_record(evidence) for evidence in evidences], collection_type="evidence", batch_size=batch_size)
+        
+def search_evidence(database, query: Dict[str, Any], top_k: int = 10, expr: Optional[str] = None,
+                    project: Optional[str] = None, output_fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
     """
     搜索证明材料
     
     Args:
         query: 查询字典，可包含keywords_embedding和/或summary_embedding字段
         top_k: 返回的结果数量
+        expr: 标量字段过滤表达式，如 'evidence_type == "财务报告"'
+        project: 只检索该项目的证明材料
+        output_fields: 结果metadata中需要的键，如["filename", "summary"]，None返回全部
         
     Returns:
         匹配的证明材料列表
@@ -31,25 +53,56 @@ def search_evidence(database, query: Dict[str, Any], top_k: int = 10) -> List[Di
     if 'keywords_embedding' not in query and 'summary_embedding' not in query:
         return []
         
-    # 组合查询向量，默认权重为keywords:0.7, summary:0.3
-    combined_embedding = [
-        0.7 * x + 0.3 * y
-        for x, y in zip(
-            query.get('keywords_embedding', [0]*len(query.get('summary_embedding', []))),
-            query.get('summary_embedding', [0]*len(query.get('keywords_embedding', [])))
-        )
-    ]
-    return database.search_data(query = combined_embedding, evidence_type="evidence", top_k = top_k)
+    # 同时包含两个向量时执行混合检索，默认权重为keywords:0.7, summary:0.3
+    if 'keywords_embedding' in query and 'summary_embedding' in query and 'weights' not in query:
+        query = {**query, 'weights': [0.7, 0.3]}
+    return database.search_data(query = query, collection_type="evidence", top_k = top_k, expr = expr, project = project,
+                                output_fields = output_fields)
     
-def batch_search_evidence(database, queries: List[Dict[str, Any]], top_k: int = 10) -> List[List[Dict[str, Any]]]:
+def batch_search_evidence(database, queries: List[Dict[str, Any]], top_k: int = 10, expr: Optional[str] = None,
+                          project: Optional[str] = None, output_fields: Optional[List[str]] = None) -> List[List[Dict[str, Any]]]:
     """
     批量搜索证明材料
     
     Args:
         queries: 查询字典列表，每个字典可包含keywords_embedding和/或summary_embedding字段
         top_k: 每个查询返回的结果数量
+        expr: 标量字段过滤表达式，对所有查询生效
+        project: 只检索该项目的证明材料
+        output_fields: 结果metadata中需要的键，None返回全部
         
     Returns:
         包含多个查询结果的列表，每个元素是对应查询的结果列表
     """
-    return [search_evidence(query, top_k) for query in queries]
\ No newline at end of file
+    return database.batch_search_data(queries, collection_type="evidence", top_k=top_k, expr=expr, project=project,
+                                      output_fields=output_fields)
+
+
+def hydrate_evidences(database, ids: List[str], fields: Optional[List[str]] = None,
+                      project: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    按ID批量取回证明材料，用于只取回id和score的检索结果
+    
+    Args:
+        ids: 证明材料ID列表
+        fields: 需要的字段，None返回全部
+        project: 证明材料所属的项目，启用分区时只加载该项目分区
+        
+    Returns:
+        ID到证明材料字典的映射
+    """
+    return database.hydrate(ids, collection_type="evidence", fields=fields, project=project)
+
+
+def stored_evidence_ids(database, project: Optional[str] = None) -> Set[str]:
+    """
+    获取已存储的证明材料ID，只读取id字段
+    
+    Args:
+        project: 只获取该项目的证明材料，启用分区时只加载该项目分区
+        
+    Returns:
+        证明材料ID集合
+    """
+    return {record["id"] for page in database.iter_dump(collection_type="evidence", output_fields=["id"], project=project)
+            for record in page}
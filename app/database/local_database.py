@@ -0,0 +1,662 @@
+import itertools
+import json
+import os
+import re
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+from app.config.__init__ import get_config
+from .cache import SearchCache
+from .records import record_id
+from .vectors import numpy_dtype, to_float32
+
+config = get_config()
+
+VECTOR_FIELDS = ("keywords_embedding", "summary_embedding")
+# 向量文件扩展名
+FILE_SUFFIXES = {"float32": "f32", "float16": "f16", "bfloat16": "bf16"}
+COLLECTION_TYPES = ("evidence", "evaluation_spec")
+
+
+class FilterParseError(ValueError):
+    """过滤表达式语法错误"""
+
+
+_TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+      | (?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+      | (?P<op>==|!=|>=|<=|>|<|&&|\|\||!|\(|\)|\[|\]|,)
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    )""", re.VERBOSE)
+_ESCAPE_PATTERN = re.compile(r"\\(u[0-9a-fA-F]{4}|.)", re.DOTALL)
+_ESCAPES = {"\\": "\\", '"': '"', "'": "'", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+def _unescape(literal: str) -> str:
+    """去掉引号并还原字符串字面量中的转义字符，单双引号写法的转义规则相同"""
+    def replace(match: "re.Match[str]") -> str:
+        escape = match.group(1)
+        if escape[0] == "u" and len(escape) == 5:
+            return chr(int(escape[1:], 16))
+        if escape not in _ESCAPES:
+            raise FilterParseError(f"过滤表达式中存在无效的转义字符: \\{escape}")
+        return _ESCAPES[escape]
+    return _ESCAPE_PATTERN.sub(replace, literal[1:-1])
+
+
+def _tokenize(expr: str) -> List[Tuple[str, Any]]:
+    tokens, position = [], 0
+    expr = expr.strip()
+    while position < len(expr):
+        match = _TOKEN_PATTERN.match(expr, position)
+        if not match or match.end() == position:
+            raise FilterParseError(f"无法解析的过滤表达式: {expr[position:]}")
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "string":
+            value = _unescape(value)
+        elif kind == "number":
+            value = int(value) if value.lstrip("-").isdigit() else float(value)
+        elif kind == "name":
+            lowered = value.lower()
+            if lowered in ("and", "or", "not", "in", "true", "false"):
+                kind, value = "op", lowered
+        tokens.append((kind, value))
+    return tokens
+
+
+class _FilterParser:
+    """解析Milvus风格的布尔过滤表达式，生成作用于记录字典的谓词
+
+    支持 ==、!=、>、<、>=、<=、in、not in、and/or/not（及 &&、||、!）和括号，
+    例如 'project == "项目A" and evidence_type in ["财务报告", "合同"]'。
+    """
+
+    def __init__(self, expr: str):
+        self.tokens = _tokenize(expr)
+        self.position = 0
+
+    def parse(self) -> Callable[[Dict[str, Any]], bool]:
+        predicate = self._or()
+        if self.position != len(self.tokens):
+            raise FilterParseError(f"过滤表达式中存在多余内容: {self.tokens[self.position:]}")
+        return predicate
+
+    def _peek(self) -> Optional[Tuple[str, Any]]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _accept(self, *values: Any) -> Optional[Any]:
+        token = self._peek()
+        if token is not None and token[0] == "op" and token[1] in values:
+            self.position += 1
+            return token[1]
+        return None
+
+    def _expect(self, value: str) -> None:
+        if self._accept(value) is None:
+            raise FilterParseError(f"过滤表达式缺少 '{value}'")
+
+    def _or(self):
+        left = self._and()
+        while self._accept("or", "||"):
+            right = self._and()
+            left = (lambda a, b: lambda record: a(record) or b(record))(left, right)
+        return left
+
+    def _and(self):
+        left = self._not()
+        while self._accept("and", "&&"):
+            right = self._not()
+            left = (lambda a, b: lambda record: a(record) and b(record))(left, right)
+        return left
+
+    def _not(self):
+        if self._accept("not", "!"):
+            inner = self._not()
+            return lambda record: not inner(record)
+        return self._comparison()
+
+    def _comparison(self):
+        if self._accept("("):
+            inner = self._or()
+            self._expect(")")
+            return inner
+        token = self._peek()
+        if token is None or token[0] != "name":
+            raise FilterParseError(f"过滤表达式应以字段名开头: {token}")
+        self.position += 1
+        field = token[1]
+
+        if self._accept("in"):
+            values = self._list()
+            return lambda record: record.get(field) in values
+        if self._accept("not"):
+            self._expect("in")
+            values = self._list()
+            return lambda record: record.get(field) not in values
+        operator = self._accept("==", "!=", ">", "<", ">=", "<=")
+        if operator is None:
+            raise FilterParseError(f"字段 {field} 后缺少比较运算符")
+        value = self._value()
+        compare = {
+            "==": lambda a, b: a == b,
+            "!=": lambda a, b: a != b,
+            ">": lambda a, b: a is not None and a > b,
+            "<": lambda a, b: a is not None and a < b,
+            ">=": lambda a, b: a is not None and a >= b,
+            "<=": lambda a, b: a is not None and a <= b,
+        }[operator]
+        return lambda record: compare(record.get(field), value)
+
+    def _value(self) -> Any:
+        token = self._peek()
+        if token is None:
+            raise FilterParseError("过滤表达式缺少比较值")
+        self.position += 1
+        if token[0] in ("string", "number"):
+            return token[1]
+        if token == ("op", "true"):
+            return True
+        if token == ("op", "false"):
+            return False
+        raise FilterParseError(f"无效的比较值: {token[1]}")
+
+    def _list(self) -> Set[Any]:
+        self._expect("[")
+        values = set()
+        if self._accept("]"):
+            return values
+        while True:
+            values.add(self._value())
+            if self._accept("]"):
+                return values
+            self._expect(",")
+
+
+def compile_filter(expr: Optional[str]) -> Optional[Callable[[Dict[str, Any]], bool]]:
+    """将过滤表达式编译为谓词函数，空表达式返回None"""
+    if not expr or not expr.strip():
+        return None
+    return _FilterParser(expr).parse()
+
+
+class _LocalCollection:
+    """单个集合的本地存储
+
+    两个向量字段各存为一个内存映射矩阵（精度由VECTOR_DTYPE决定，按行追加，容量不足时翻倍扩容），
+    ID和metadata存为JSON文件。删除和覆盖写入的行先标记为空，空行多于有效行时在落盘时压缩，
+    压缩结果写入新一代文件，records.json替换后才删除旧文件。
+    """
+
+    def __init__(self, path: Path, dim: int, dtype: str = "float32"):
+        self.path = path
+        self.dim = dim
+        self.dtype = dtype
+        self.lock = threading.RLock()
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self.generation = 0
+        self.ids: List[Optional[str]] = []
+        self.metadata: List[Optional[Dict[str, Any]]] = []
+        records_path = self.path / "records.json"
+        if records_path.exists():
+            with open(records_path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            if stored.get("dim") != dim:
+                raise ValueError(f"本地向量库维度{stored.get('dim')}与EMBEDDING_DIM={dim}不一致，请删除 {self.path} 后重建")
+            if stored.get("dtype", "float32") != dtype:
+                raise ValueError(f"本地向量库精度{stored.get('dtype', 'float32')}与VECTOR_DTYPE={dtype}不一致，请删除 {self.path} 后重建")
+            self.generation = stored.get("generation", 0)
+            self.ids = stored["ids"]
+            self.metadata = stored["metadata"]
+        self.row_of: Dict[str, int] = {data_id: row for row, data_id in enumerate(self.ids) if data_id is not None}
+
+        self.capacity = max(len(self.ids), 1024)
+        self.vectors = {field: self._open_matrix(field, self.capacity) for field in VECTOR_FIELDS}
+        # 缓存各行向量的平方范数，L2距离计算时复用
+        self.sq_norms = {field: self._sq_norms(self.matrix(field)) for field in VECTOR_FIELDS}
+
+    @staticmethod
+    def _sq_norms(matrix: np.ndarray) -> np.ndarray:
+        return np.einsum("ij,ij->i", matrix, matrix)
+
+    def matrix(self, field: str, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """以float32返回向量矩阵的有效行，半精度存储时转换为float32计算"""
+        rows = self.vectors[field][start:self.size if stop is None else stop]
+        return rows if rows.dtype == np.float32 else rows.astype(np.float32)
+
+    def _matrix_path(self, field: str, generation: int) -> Path:
+        suffix = FILE_SUFFIXES[self.dtype]
+        return self.path / (f"{field}.{suffix}" if generation == 0 else f"{field}.{generation}.{suffix}")
+
+    def _open_matrix(self, field: str, capacity: int, generation: Optional[int] = None) -> np.memmap:
+        file_path = self._matrix_path(field, self.generation if generation is None else generation)
+        item_dtype = numpy_dtype(self.dtype)
+        size = capacity * self.dim * item_dtype.itemsize
+        with open(file_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(file_path, dtype=item_dtype, mode="r+", shape=(capacity, self.dim))
+
+    def _ensure_capacity(self, rows: int) -> None:
+        if rows <= self.capacity:
+            return
+        capacity = max(rows, self.capacity * 2)
+        for field, matrix in self.vectors.items():
+            matrix.flush()
+            del matrix
+            self.vectors[field] = self._open_matrix(field, capacity)
+        self.capacity = capacity
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    def alive_mask(self) -> np.ndarray:
+        return np.fromiter((data_id is not None for data_id in self.ids), dtype=bool, count=len(self.ids))
+
+    def record(self, row: int) -> Dict[str, Any]:
+        """用于过滤的记录视图：metadata加上id"""
+        return {**(self.metadata[row] or {}), "id": self.ids[row]}
+
+    def append(self, ids: List[str], vectors: Dict[str, np.ndarray], metadatas: List[Dict[str, Any]]) -> None:
+        with self.lock:
+            # 已存在的ID视为覆盖写入，旧行标记删除
+            self.delete_rows([self.row_of[data_id] for data_id in ids if data_id in self.row_of])
+            start = self.size
+            self._ensure_capacity(start + len(ids))
+            for field in VECTOR_FIELDS:
+                self.vectors[field][start:start + len(ids)] = vectors[field]
+                # 范数按存储精度下的向量计算，与检索时的矩阵一致
+                stored = self.matrix(field, start, start + len(ids))
+                self.sq_norms[field] = np.concatenate([self.sq_norms[field], self._sq_norms(stored)])
+            for offset, (data_id, metadata) in enumerate(zip(ids, metadatas)):
+                self.ids.append(data_id)
+                self.metadata.append(metadata)
+                self.row_of[data_id] = start + offset
+
+    def delete_rows(self, rows: List[int]) -> None:
+        with self.lock:
+            for row in rows:
+                data_id = self.ids[row]
+                if data_id is not None:
+                    self.row_of.pop(data_id, None)
+                    self.ids[row] = None
+                    self.metadata[row] = None
+
+    def _compact(self) -> int:
+        """将有效行写入新一代向量文件，返回旧的代号"""
+        rows = np.flatnonzero(self.alive_mask())
+        previous = self.generation
+        capacity = max(len(rows), 1024)
+        vectors = {}
+        for field, matrix in self.vectors.items():
+            vectors[field] = self._open_matrix(field, capacity, previous + 1)
+            vectors[field][:len(rows)] = matrix[rows]
+            vectors[field].flush()
+            self.sq_norms[field] = self.sq_norms[field][rows]
+        self.vectors, self.capacity, self.generation = vectors, capacity, previous + 1
+        self.ids = [self.ids[row] for row in rows]
+        self.metadata = [self.metadata[row] for row in rows]
+        self.row_of = {data_id: row for row, data_id in enumerate(self.ids)}
+        return previous
+
+    def flush(self) -> None:
+        """将向量和记录写入磁盘，记录文件先写临时文件再替换，避免写入中断导致损坏"""
+        with self.lock:
+            previous = None
+            if self.size - len(self.row_of) > len(self.row_of):
+                previous = self._compact()
+            for matrix in self.vectors.values():
+                matrix.flush()
+            tmp_path = self.path / "records.json.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"dim": self.dim, "dtype": self.dtype, "generation": self.generation, "ids": self.ids, "metadata": self.metadata},
+                          f, ensure_ascii=False)
+            os.replace(tmp_path, self.path / "records.json")
+            if previous is not None:
+                for field in VECTOR_FIELDS:
+                    self._matrix_path(field, previous).unlink(missing_ok=True)
+
+
+class LocalDatabase:
+    """进程内向量库，实现与Database相同的接口，无需外部Milvus服务
+
+    向量以内存映射矩阵（精度由VECTOR_DTYPE决定）持久化在LOCAL_DATABASE_PATH下，检索为NumPy向量化的精确top-k，
+    适合单机部署和测试。相似度度量沿用MILVUS_METRIC_TYPE，L2返回距离平方，与Milvus一致。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        print("Initializing local vector database...")
+        self.path = Path(path or config.LOCAL_DATABASE_PATH)
+        self.dim = int(config.EMBEDDING_DIM)
+        self.metric = config.MILVUS_METRIC_TYPE
+        self._collections: Dict[str, _LocalCollection] = {}
+        # 检索结果缓存，写入和删除时递增集合代号使旧结果失效
+        self._search_cache = SearchCache(config.DATABASE_SEARCH_CACHE_SIZE)
+
+        # 与Milvus后端一致：非持久化模式下每次启动清空数据
+        if not config.MILVUS_PERSISTENT:
+            self.drop_collection(collection_type="evidence")
+            self.drop_collection(collection_type="evaluation_spec")
+        for collection_type in COLLECTION_TYPES:
+            self._collection(collection_type)
+
+    def _collection(self, collection_type: str) -> _LocalCollection:
+        """根据集合类型获取集合对象"""
+        if collection_type not in COLLECTION_TYPES:
+            raise ValueError(f"无效的collection_type: {collection_type}")
+        if collection_type not in self._collections:
+            self._collections[collection_type] = _LocalCollection(self.path / collection_type, self.dim, config.VECTOR_DTYPE)
+        return self._collections[collection_type]
+
+    @staticmethod
+    def _record_metadata(record: Dict[str, Any]) -> Dict[str, Any]:
+        metadata = record.get("metadata") or {}
+        return json.loads(metadata) if isinstance(metadata, str) else dict(metadata)
+
+    def store_data(self, data: Dict[str, Any], collection_type: str = "evidence") -> str:
+        """存储数据
+
+        Args:
+            data: 要存储的数据字典，包含id、两个向量字段和metadata
+            collection_type: 集合类型，可选值为"evidence"或"evaluation_spec"
+        """
+        return self.store_data_batch([data], collection_type)[0]
+
+    def store_data_batch(self, records: List[Dict[str, Any]], collection_type: str = "evidence",
+                         batch_size: Optional[int] = None) -> List[str]:
+        """批量覆盖写入数据，全部写入后统一落盘一次
+
+        写入以ID为键upsert，重复写入相同内容不会产生重复记录；同一批次内ID重复时以最后一条为准。
+
+        Args:
+            records: 数据字典列表，字段与store_data相同
+            collection_type: 集合类型，可选值为"evidence"或"evaluation_spec"
+            batch_size: 为与Database接口一致而保留，本地写入不分批
+
+        Returns:
+            存储数据的ID列表，与输入顺序一致
+        """
+        collection = self._collection(collection_type)
+        if not records:
+            return []
+        ids = [record_id(record) for record in records]
+        unique = {data_id: record for data_id, record in zip(ids, records)}
+        vectors = {
+            field: np.stack([np.asarray(record[field], dtype=np.float32) for record in unique.values()])
+            for field in VECTOR_FIELDS
+        }
+        collection.append(list(unique), vectors, [self._record_metadata(record) for record in unique.values()])
+        collection.flush()
+        self._search_cache.bump(collection_type)
+        return ids
+
+    def _scores(self, collection: _LocalCollection, field: str, queries: np.ndarray) -> np.ndarray:
+        """计算查询与全部行的得分，统一为越小越相似"""
+        matrix = collection.matrix(field)
+        dots = queries @ matrix.T
+        if self.metric == "L2":
+            return (queries ** 2).sum(axis=1, keepdims=True) - 2 * dots + collection.sq_norms[field]
+        if self.metric == "COSINE":
+            norms = np.sqrt(collection.sq_norms[field]) * np.linalg.norm(queries, axis=1, keepdims=True)
+            return -dots / np.maximum(norms, 1e-12)
+        return -dots
+
+    def _raw_score(self, score: float) -> float:
+        """转换回Milvus的得分约定：L2为距离平方，IP/COSINE为相似度"""
+        return float(score) if self.metric == "L2" else float(-score)
+
+    def _normalize(self, score: float) -> float:
+        """与Milvus WeightedRanker一致的得分归一化"""
+        if self.metric == "L2":
+            return 1 - 2 * np.arctan(score) / np.pi
+        if self.metric == "COSINE":
+            return (score + 1) / 2
+        return 0.5 + np.arctan(score) / np.pi
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """返回每行得分最小的k个下标（按得分升序）"""
+        k = min(k, scores.shape[1])
+        if k <= 0:
+            return np.empty((scores.shape[0], 0), dtype=np.int64)
+        candidates = np.argpartition(scores, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(scores, candidates, axis=1).argsort(axis=1)
+        return np.take_along_axis(candidates, order, axis=1)
+
+    def search_data(self, query: Dict[str, Any], collection_type: str = "evidence", top_k: int = 10,
+                    search_params: Optional[Dict[str, Any]] = None, expr: Optional[str] = None,
+                    project: Optional[str] = None,
+                    output_fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """在指定集合中搜索相似数据，参数与Database.search_data相同（search_params对精确检索无效）"""
+        return self.batch_search_data([query], collection_type, top_k, search_params=search_params,
+                                      expr=expr, project=project, output_fields=output_fields)[0]
+
+    def batch_search_data(self, queries: List[Dict[str, Any]], collection_type: str = "evidence",
+                          top_k: int = 10, batch_size: int = 1024,
+                          search_params: Optional[Dict[str, Any]] = None,
+                          expr: Optional[str] = None,
+                          project: Optional[str] = None,
+                          output_fields: Optional[List[str]] = None) -> List[List[Dict[str, Any]]]:
+        """批量搜索，参数与Database.batch_search_data相同
+
+        单字段查询直接按得分取top-k；同时包含两个字段的查询先各取top-k候选，
+        再按ranker（weighted或rrf）融合，融合得分越大越相似。
+        """
+        options = (top_k, json.dumps(search_params, sort_keys=True, default=str), expr, project)
+        return self._search_cache.search(
+            collection_type, queries, options,
+            lambda missing: self._batch_search(missing, collection_type, top_k, batch_size, expr, project, output_fields),
+            lambda ids: self.hydrate(ids, collection_type, fields=output_fields, project=project)
+        )
+
+    def _batch_search(self, queries: List[Dict[str, Any]], collection_type: str, top_k: int, batch_size: int,
+                      expr: Optional[str], project: Optional[str],
+                      output_fields: Optional[List[str]]) -> List[List[Dict[str, Any]]]:
+        """执行批量检索，不经过结果缓存"""
+        collection = self._collection(collection_type)
+        predicate = compile_filter(self._project_expr(collection_type, project, expr))
+
+        with collection.lock:
+            mask = collection.alive_mask()
+            if predicate is not None:
+                mask &= np.fromiter(
+                    (mask[row] and predicate(collection.record(row)) for row in range(collection.size)),
+                    dtype=bool, count=collection.size
+                )
+            rows = np.flatnonzero(mask)
+
+            results: List[List[Dict[str, Any]]] = []
+            for start in range(0, len(queries), batch_size):
+                chunk = queries[start:start + batch_size]
+                for query in chunk:
+                    if "keywords_embedding" not in query and "summary_embedding" not in query:
+                        raise ValueError("查询中必须包含keywords_embedding或summary_embedding字段")
+                per_field = {}
+                for field in VECTOR_FIELDS:
+                    members = [i for i, query in enumerate(chunk) if field in query]
+                    if not members or len(rows) == 0:
+                        continue
+                    vectors = np.stack([np.asarray(chunk[i][field], dtype=np.float32) for i in members])
+                    scores = self._scores(collection, field, vectors)[:, rows]
+                    top = self._top_k(scores, top_k)
+                    for position, i in enumerate(members):
+                        per_field[(i, field)] = [
+                            (int(rows[column]), float(scores[position, column])) for column in top[position]
+                        ]
+                for i, query in enumerate(chunk):
+                    results.append(self._fuse(collection, query, per_field, i, top_k, output_fields))
+        return results
+
+    def _fuse(self, collection: _LocalCollection, query: Dict[str, Any],
+              per_field: Dict[Tuple[int, str], List[Tuple[int, float]]], index: int, top_k: int,
+              output_fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """生成单个查询的结果，混合检索时融合两个字段的候选"""
+        fields = [field for field in VECTOR_FIELDS if (index, field) in per_field]
+        if len(fields) == 1:
+            hits = [(row, self._raw_score(score)) for row, score in per_field[(index, fields[0])]]
+        elif len(fields) == 2:
+            fused: Dict[int, float] = {}
+            if query.get("ranker", "weighted") == "rrf":
+                rrf_k = int(query.get("rrf_k", 60))
+                for field in fields:
+                    for rank, (row, _) in enumerate(per_field[(index, field)]):
+                        fused[row] = fused.get(row, 0.0) + 1 / (rrf_k + rank + 1)
+            else:
+                weights = query.get("weights", [0.5, 0.5])
+                if len(weights) != 2:
+                    weights = [0.5, 0.5]
+                for weight, field in zip(weights, fields):
+                    for row, score in per_field[(index, field)]:
+                        fused[row] = fused.get(row, 0.0) + weight * self._normalize(self._raw_score(score))
+            hits = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        else:
+            hits = []
+        return [
+            {"id": collection.ids[row], "metadata": self._project(collection, row, output_fields), "score": score}
+            for row, score in hits
+        ]
+
+    @staticmethod
+    def _project(collection: _LocalCollection, row: int, fields: Optional[List[str]]) -> Dict[str, Any]:
+        """按需要的键复制metadata，fields为None时返回全部"""
+        if fields is None:
+            return dict(collection.metadata[row])
+        record = collection.record(row)
+        return {name: record[name] for name in fields if name in record}
+
+    def hydrate(self, ids: List[str], collection_type: str = "evidence", fields: Optional[List[str]] = None,
+                batch_size: int = 1000, project: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """按ID批量取回记录的metadata，参数与Database.hydrate相同；数据已在内存中，无需额外缓存"""
+        collection = self._collection(collection_type)
+        with collection.lock:
+            return {
+                data_id: self._project(collection, collection.row_of[data_id], fields)
+                for data_id in dict.fromkeys(ids)
+                if data_id in collection.row_of and self._in_project(collection, collection.row_of[data_id], collection_type, project)
+            }
+
+    def existing_ids(self, ids: List[str], collection_type: str = "evidence", batch_size: int = 1000,
+                     project: Optional[str] = None) -> Set[str]:
+        """查询给定ID中已存储在集合中的部分，参数与Database.existing_ids相同"""
+        collection = self._collection(collection_type)
+        with collection.lock:
+            return {
+                data_id for data_id in ids
+                if data_id in collection.row_of and self._in_project(collection, collection.row_of[data_id], collection_type, project)
+            }
+
+    @staticmethod
+    def _in_project(collection: _LocalCollection, row: int, collection_type: str, project: Optional[str]) -> bool:
+        """与Milvus后端的项目分区一致：指定项目时只匹配该项目的证明材料"""
+        if project is None or collection_type != "evidence":
+            return True
+        return (collection.metadata[row] or {}).get("project") == project
+
+    @staticmethod
+    def _project_expr(collection_type: str, project: Optional[str], expr: Optional[str]) -> Optional[str]:
+        """将项目条件合并到过滤表达式中"""
+        if project is None or collection_type != "evidence":
+            return expr
+        project_expr = f"project == {json.dumps(project, ensure_ascii=False)}"
+        return f"({expr}) and {project_expr}" if expr else project_expr
+
+    def iter_dump(self, collection_type: str = "evidence", batch_size: Optional[int] = None,
+                  output_fields: Optional[List[str]] = None, expr: str = "",
+                  project: Optional[str] = None) -> Iterator[List[Dict[str, Any]]]:
+        """分页导出集合数据，参数与Database.iter_dump相同"""
+        collection = self._collection(collection_type)
+        batch_size = batch_size or config.MILVUS_QUERY_BATCH_SIZE
+        output_fields = output_fields or ["id", *VECTOR_FIELDS, "metadata"]
+        predicate = compile_filter(self._project_expr(collection_type, project, expr))
+
+        with collection.lock:
+            ids = [
+                collection.ids[row] for row in range(collection.size)
+                if collection.ids[row] is not None and (predicate is None or predicate(collection.record(row)))
+            ]
+        # 压缩会重排行号并替换内存映射文件，每页在锁内按ID重新定位并复制数据；期间被删除的记录跳过
+        for start in range(0, len(ids), batch_size):
+            page = []
+            with collection.lock:
+                for data_id in ids[start:start + batch_size]:
+                    row = collection.row_of.get(data_id)
+                    if row is None:
+                        continue
+                    record = {"id": data_id}
+                    for field in VECTOR_FIELDS:
+                        if field in output_fields:
+                            record[field] = to_float32(collection.vectors[field][row], collection.dtype)
+                    if "metadata" in output_fields:
+                        record["metadata"] = dict(collection.metadata[row] or {})
+                    page.append(record)
+            if page:
+                yield page
+
+    def dump(self, collection_type: str = "evidence", limit: Optional[int] = None,
+             output_fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """导出指定集合中的数据，limit默认不限制"""
+        records = (record for page in self.iter_dump(collection_type, output_fields=output_fields) for record in page)
+        return list(itertools.islice(records, limit))
+
+    def delete_by_ids(self, ids: List[str], collection_type: str = "evidence", batch_size: int = 1000) -> int:
+        """按ID删除数据，返回删除的记录数"""
+        collection = self._collection(collection_type)
+        with collection.lock:
+            rows = [collection.row_of[data_id] for data_id in set(ids) if data_id in collection.row_of]
+            collection.delete_rows(rows)
+            collection.flush()
+        if rows:
+            self._search_cache.bump(collection_type)
+        return len(rows)
+
+    def delete_by_filter(self, expr: str, collection_type: str = "evidence", project: Optional[str] = None) -> int:
+        """删除满足过滤表达式的数据，返回删除的记录数，参数与Database.delete_by_filter相同"""
+        if compile_filter(expr) is None:
+            raise ValueError("删除过滤表达式不能为空，清空集合请使用delete_all_data")
+        predicate = compile_filter(self._project_expr(collection_type, project, expr))
+        collection = self._collection(collection_type)
+        with collection.lock:
+            rows = [
+                row for row in range(collection.size)
+                if collection.ids[row] is not None and predicate(collection.record(row))
+            ]
+            collection.delete_rows(rows)
+            collection.flush()
+        if rows:
+            self._search_cache.bump(collection_type)
+        return len(rows)
+
+    def delete_all_data(self, collection_type: str = "evidence") -> None:
+        """删除指定集合中的所有数据"""
+        self.delete_by_filter('id != ""', collection_type)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """返回检索结果缓存的命中统计，本地后端回表直接读内存，没有回表缓存"""
+        return {"search": self._search_cache.stats(), "hydrate": {}}
+
+    def close(self) -> None:
+        """落盘并关闭全部集合的内存映射文件"""
+        for collection in self._collections.values():
+            collection.flush()
+        self._collections.clear()
+        print("Local vector database closed")
+
+    def drop_collection(self, collection_type: str = "evidence") -> None:
+        """彻底删除指定集合的文件"""
+        if collection_type not in COLLECTION_TYPES:
+            raise ValueError(f"无效的collection_type: {collection_type}")
+        self._collections.pop(collection_type, None)
+        self._search_cache.bump(collection_type)
+        collection_path = self.path / collection_type
+        if collection_path.exists():
+            shutil.rmtree(collection_path)
+            print(f"已删除本地集合 {collection_type}")
+        else:
+            print(f"本地集合 {collection_type} 不存在，无需删除")
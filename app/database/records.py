@@ -0,0 +1,26 @@
+import hashlib
+import json
+from typing import Any, Dict, Iterable
+
+
+def content_id(values: Iterable[Any]) -> str:
+    """由标识字段计算确定性ID，与EvidenceItem/EvaluationSpecItem.content_hash算法一致"""
+    payload = json.dumps(list(values), ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def record_id(record: Dict[str, Any]) -> str:
+    """返回记录ID，未指定时由metadata内容计算，重复写入相同内容时ID不变
+
+    Args:
+        record: 数据库记录，metadata可以是字典或JSON字符串
+
+    Returns:
+        记录ID
+    """
+    if record.get("id"):
+        return record["id"]
+    metadata = record.get("metadata") or {}
+    if isinstance(metadata, str):
+        metadata = json.loads(metadata)
+    return content_id(sorted(metadata.items()))
@@ -0,0 +1,36 @@
+from typing import Any
+
+import numpy as np
+
+# 支持的向量存储精度，bfloat16需要安装ml_dtypes
+VECTOR_DTYPES = ("float32", "float16", "bfloat16")
+
+
+def numpy_dtype(name: str) -> np.dtype:
+    """返回向量存储精度对应的NumPy类型"""
+    if name == "bfloat16":
+        try:
+            import ml_dtypes
+        except ImportError as e:
+            raise ImportError("VECTOR_DTYPE=bfloat16 需要安装 ml_dtypes：pip install ml_dtypes") from e
+        return np.dtype(ml_dtypes.bfloat16)
+    if name not in VECTOR_DTYPES:
+        raise ValueError(f"不支持的向量精度: {name}")
+    return np.dtype(name)
+
+
+def to_storage(vector: Any, name: str) -> np.ndarray:
+    """将向量转换为存储精度"""
+    return np.asarray(vector, dtype=np.float32).astype(numpy_dtype(name))
+
+
+def to_float32(value: Any, name: str) -> np.ndarray:
+    """将存储的向量转换回float32数组
+
+    Milvus查询半精度向量字段时返回原始字节（包在单元素列表中），按存储精度解码。
+    """
+    if isinstance(value, list) and len(value) == 1 and isinstance(value[0], bytes):
+        value = value[0]
+    if isinstance(value, bytes):
+        return np.frombuffer(value, dtype=numpy_dtype(name)).astype(np.float32)
+    return np.asarray(value).astype(np.float32)
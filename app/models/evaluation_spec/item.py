@@ -1,10 +1,15 @@
-from typing import List, Dict, Optional
-from pydantic import BaseModel, Field
+import hashlib
+import json
+from typing import List, Dict, Optional, Union
+import numpy as np
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
 from uuid import uuid4
 
 class EvaluationSpecItem(BaseModel):
     """评估规范项类"""
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     id: str = Field(default_factory=lambda: str(uuid4()))  # 唯一标识
     primary_title: str  # 一级标题
     secondary_title: str  # 二级标题
@@ -12,11 +17,24 @@ class EvaluationSpecItem(BaseModel):
     content: str  # 内容
     evaluation_guidelines: List[str]  # 评估指南
     summary: str = ""  # 摘要
-    summary_embedding: Optional[List[float]] = None  # 摘要向量
+    summary_embedding: Optional[Union[np.ndarray, List[float]]] = None  # 摘要向量（float32数组）
     keywords: List[str] = [] # 关键词
-    keywords_embedding: Optional[List[float]] = None  # 关键词向量
+    keywords_embedding: Optional[Union[np.ndarray, List[float]]] = None  # 关键词向量（float32数组）
     created_at: str = Field(default_factory=lambda: datetime.now().isoformat())  # 创建时间
     
+    def content_hash(self) -> str:
+        """根据标题、内容和评估指南计算稳定的ID"""
+        payload = json.dumps(
+            [self.primary_title, self.secondary_title, self.tertiary_title, self.content, self.evaluation_guidelines],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def index_hash(self) -> str:
+        """根据写入索引的内容计算哈希，摘要或关键词变化后需要重新生成向量并写入数据库"""
+        payload = json.dumps([self.content_hash(), self.summary, self.keywords], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
     def to_dict(self, embeddings: bool = False) -> Dict[str, any]:
         """将评估规范项转换为字典
         Args:
@@ -31,6 +49,7 @@ class EvaluationSpecItem(BaseModel):
             "tertiary_title": self.tertiary_title,
             "content": self.content,
             "evaluation_guidelines": self.evaluation_guidelines,
+            "summary": self.summary,
             "keywords": self.keywords,
             "created_at": self.created_at
         }
@@ -1,30 +1,57 @@
+import asyncio
+import numpy as np
 from typing import List, Dict, Optional
-from tqdm import tqdm
+from tqdm.asyncio import tqdm_asyncio
 import json
 from app.models.evaluation_spec.item import EvaluationSpecItem
-from app.utils.maas_client import MaaSClient
+from app.utils.maas_client import AsyncMaaSClient, get_async_maas_client, run_on_background_loop, run_sync
 from app.models.evaluation_spec.prompt import DEFAULT_SUMMARY_PROMPT
-from app.database import get_database, store_evaluation_spec
+from app.database import delete_by_ids, get_database, hydrate_evaluation_specs, store_evaluation_specs, stored_evaluation_spec_ids
 
-database = get_database()  # 获取数据库实例
 
 class EvaluationSpecManager:
     """评估规范管理类"""
     
     def __init__(self):
         self.specs: List[EvaluationSpecItem] = []
+        # 已写入数据库的评估规范ID及写入时的索引哈希，用于增量生成索引
+        self._indexed: Dict[str, str] = {}
+        # 串行化索引生成，只在后台事件循环中使用
+        self._index_lock = asyncio.Lock()
         self.load_from_json()
         self.generate_index()
         
     def load_from_json(self, file_path: str = "data/evaluation_spec.json") -> None:
+        """从JSON文件加载评估规范（同步入口，在共享的后台事件循环中持有索引锁执行）
+        Args:
+            file_path: JSON 文件路径
+        """
+        run_sync(self.aload_from_json(file_path))
+
+    async def aload_from_json(self, file_path: str = "data/evaluation_spec.json") -> None:
+        """异步从JSON文件加载评估规范（可在任意事件循环中调用）
+
+        与生成索引持有同一把索引锁，索引过程中不会修改列表和已索引记录。
+        Args:
+            file_path: JSON 文件路径
         """
-        从json文件加载所有评估规范
+        async def locked():
+            async with self._index_lock:
+                await asyncio.to_thread(self._load_from_json, file_path)
+        await run_on_background_loop(locked())
+
+    def _load_from_json(self, file_path: str = "data/evaluation_spec.json") -> None:
+        """
+        从json文件加载所有评估规范，可重复调用：规范列表替换为文件内容并按ID去重，
+        已加载且摘要和关键词未变化的规范保留内存中的对象
         :param file_path: JSON 文件路径
         """
         
         try:
             with open(file_path, "r", encoding="utf-8") as f:
                 data = json.load(f)
+            loaded = {spec.id: spec for spec in self.specs}
+            specs: Dict[str, EvaluationSpecItem] = {}
         
         # 转换为 EvaluationSpecItem 对象
             for item in data:
@@ -38,7 +65,13 @@ class EvaluationSpecManager:
                     keywords=item.get("keywords", []),
                     summary=item.get("summary", "")
                 )
-                self.specs.append(spec)
+                # 使用内容哈希作为ID，重启后可识别数据库中已存储的规范
+                spec.id = spec.content_hash()
+                current = loaded.get(spec.id)
+                if current is not None and (not spec.summary or (spec.summary, spec.keywords) == (current.summary, current.keywords)):
+                    spec = current
+                specs.setdefault(spec.id, spec)
+            self.specs = list(specs.values())
             
             print(f"Loaded {len(self.specs)} evaluation specs from {file_path}")
         except FileNotFoundError:
@@ -61,47 +94,126 @@ class EvaluationSpecManager:
             print(f"Error saving evaluation specs: {e}")
 
     def generate_index(self, summary_prompt: str = None) -> None:
-        """生成评估规范索引
+        """生成评估规范索引（同步入口，在共享的后台事件循环中执行）
         Args:
             summary_prompt: 可选的自定义提示词模板，如果未提供则使用默认模板
         """
+        run_sync(self.agenerate_index(summary_prompt))
+
+    async def agenerate_index(self, summary_prompt: str = None) -> None:
+        """异步生成评估规范索引（可在任意事件循环中调用）
+
+        与generate_index一样在后台事件循环中执行并持有同一把索引锁，并发调用不会重复处理同一批规范。
+        Args:
+            summary_prompt: 可选的自定义提示词模板，如果未提供则使用默认模板
+        """
+        async def locked():
+            async with self._index_lock:
+                await self._generate_index(summary_prompt)
+                await asyncio.to_thread(self._delete_orphans)
+        await run_on_background_loop(locked())
+
+    async def _generate_index(self, summary_prompt: str = None) -> None:
+        """生成评估规范索引，摘要和向量请求并发执行"""
         
         if summary_prompt is None:
             summary_prompt = DEFAULT_SUMMARY_PROMPT
         
-        client = MaaSClient()
+        client = get_async_maas_client()
         
-        for spec in tqdm(self.specs, desc="Processing EvaluationSpec", unit="spec"):
-            if spec.summary == "" or spec.keywords == []:
-                # 构建提示词
-                prompt = summary_prompt.format(
-                    primary_title=spec.primary_title,
-                    secondary_title=spec.secondary_title,
-                    tertiary_title=spec.tertiary_title,
-                    content=spec.content,
-                    guidelines="\n".join(spec.evaluation_guidelines)
-                )
-                # print(prompt)
-                # 调用大模型接口，指定JSON格式输出
-                response = client.chat_completion(prompt, output_format='json')
-                
-                # 更新摘要和关键词
-                spec.summary = response['summary']
-                # 处理keywords，兼容字符串和列表
-                keywords = response['keywords']
-                spec.keywords = keywords.split(',') if isinstance(keywords, str) else keywords
-            
-            
-            # 获取摘要和关键词的向量
-            spec.summary_embedding = client.get_embeddings(spec.summary)
-            spec.keywords_embedding = client.get_embeddings(' '.join(spec.keywords))
-            
-            # 将评估规范插入数据库
-            try:
-                store_evaluation_spec(database = database, spec = spec.to_dict(embeddings=True))
-            except Exception as e:
-                print(f"Error upserting evaluation spec: {str(e)}")
-                raise
+        # 索引哈希与上次写入时一致的规范无需处理
+        dirty = list({spec.id: spec for spec in self.specs if self._indexed.get(spec.id) != spec.index_hash()}.values())
+        # 本进程未写入过的规范读取数据库中记录的索引哈希，与当前内容一致才视为已索引；
+        # 早期写入的记录没有索引哈希，会被重新索引一次
+        untracked = [spec.id for spec in dirty if spec.id not in self._indexed]
+        hydrated = await asyncio.to_thread(hydrate_evaluation_specs, get_database(), untracked, ["index_hash"]) if untracked else {}
+        up_to_date = set()
+        for spec in dirty:
+            if spec.id in hydrated:
+                self._indexed[spec.id] = hydrated[spec.id].get("index_hash")
+                if self._indexed[spec.id] == spec.index_hash():
+                    up_to_date.add(spec.id)
+        targets = [spec for spec in dirty if spec.id not in up_to_date]
+        if up_to_date:
+            print(f"Skipped {len(up_to_date)} specs already stored in database")
+        if not targets:
+            return
+        print(f"Indexing {len(targets)} new or changed specs")
+        
+        pending = [spec for spec in targets if spec.summary == "" or spec.keywords == []]
+        results = await tqdm_asyncio.gather(
+            *(self._generate_summary(client, spec, summary_prompt) for spec in pending),
+            desc="Processing EvaluationSpec", unit="spec", return_exceptions=True
+        )
+        # 单条规范失败不影响其余规范写入，失败的规范下次生成索引时重试
+        failed = set()
+        for spec, result in zip(pending, results):
+            if isinstance(result, Exception):
+                failed.add(spec.id)
+                print(f"生成评估规范 {spec.primary_title} 的摘要失败: {result}")
+        targets = [spec for spec in targets if spec.id not in failed]
+        if not targets:
+            return
+        
+        # 批量获取摘要和关键词的向量
+        summary_embeddings, keywords_embeddings = await asyncio.gather(
+            client.get_embeddings([spec.summary for spec in targets]),
+            client.get_embeddings([' '.join(spec.keywords) for spec in targets])
+        )
+        
+        # 数据库写入为同步调用，放到线程中执行以免阻塞事件循环
+        await asyncio.to_thread(self._store_index, targets, summary_embeddings, keywords_embeddings)
+
+    def _delete_orphans(self) -> None:
+        """删除数据库中已不在当前规范列表中的记录（如重新上传规范文件后被移除或修改的规范），
+        避免旧规范仍被导出用于生成报告；规范列表为空时（如JSON加载失败）不做删除
+        """
+        if not self.specs:
+            return
+        orphans = list(stored_evaluation_spec_ids(get_database()) - {spec.id for spec in self.specs})
+        if not orphans:
+            return
+        deleted = delete_by_ids(orphans, collection_type="evaluation_spec")
+        for data_id in orphans:
+            self._indexed.pop(data_id, None)
+        print(f"Deleted {deleted} orphan evaluation specs from database")
+
+    async def _generate_summary(self, client: AsyncMaaSClient, spec: EvaluationSpecItem, summary_prompt: str) -> None:
+        """调用大模型生成单个评估规范的摘要和关键词"""
+        # 构建提示词
+        prompt = summary_prompt.format(
+            primary_title=spec.primary_title,
+            secondary_title=spec.secondary_title,
+            tertiary_title=spec.tertiary_title,
+            content=spec.content,
+            guidelines="\n".join(spec.evaluation_guidelines)
+        )
+        # 调用大模型接口，指定JSON格式输出
+        response = await client.chat_completion(prompt, output_format='json')
+        
+        # 更新摘要和关键词
+        spec.summary = response['summary']
+        # 处理keywords，兼容字符串和列表
+        keywords = response['keywords']
+        spec.keywords = keywords.split(',') if isinstance(keywords, str) else keywords
+
+    def _store_index(self, specs: List[EvaluationSpecItem], summary_embeddings: List[np.ndarray], keywords_embeddings: List[np.ndarray]) -> None:
+        """写入向量并将评估规范批量插入数据库"""
+        for spec, summary_embedding, keywords_embedding in zip(specs, summary_embeddings, keywords_embeddings):
+            spec.summary_embedding = summary_embedding
+            spec.keywords_embedding = keywords_embedding
+        
+        # 按列批量写入，每批一次insert请求
+        try:
+            # 索引哈希随记录写入metadata，重启后据此判断规范是否需要重新索引
+            store_evaluation_specs(database = get_database(), specs = [
+                {**spec.to_dict(embeddings=True), "index_hash": spec.index_hash()} for spec in specs
+            ])
+        except Exception as e:
+            print(f"Error inserting evaluation specs: {str(e)}")
+            raise
+        for spec in specs:
+            self._indexed[spec.id] = spec.index_hash()
         
         # 保存更新后的评估规范到JSON文件
         self.save_to_json()
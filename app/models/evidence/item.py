@@ -1,10 +1,15 @@
 from pickle import FALSE
-from pydantic import BaseModel
-from typing import Optional, List
+import hashlib
+import json
+import numpy as np
+from pydantic import BaseModel, ConfigDict
+from typing import Optional, List, Union
 from datetime import datetime
 
 class EvidenceItem(BaseModel):
     """证明材料项类"""
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     id: Optional[str] = None  # 唯一标识，由manager分配
     created_at: Optional[str] = None  # 创建时间
     filename: str  # 文件名
@@ -15,9 +20,25 @@ class EvidenceItem(BaseModel):
     evidence_type: str  # 类型
     content: str  # 内容
     summary: Optional[str] = ""  # 摘要
-    summary_embedding: Optional[List[float]] = None  # 摘要向量
+    summary_embedding: Optional[Union[np.ndarray, List[float]]] = None  # 摘要向量（float32数组）
     keywords: Optional[List[str]] = []  # 关键词
-    keywords_embedding: Optional[List[float]] = None
+    keywords_embedding: Optional[Union[np.ndarray, List[float]]] = None  # 关键词向量（float32数组）
+
+    def content_hash(self) -> str:
+        """根据材料来源和内容计算稳定的ID，相同材料在重启或重复上传后ID不变"""
+        payload = json.dumps(
+            [self.filename, self.file_format, self.collector, self.project, self.evidence_type, self.content],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def index_hash(self) -> str:
+        """根据写入索引的内容计算哈希，摘要或关键词变化后需要重新生成向量并写入数据库"""
+        payload = json.dumps(
+            [self.content_hash(), self.summary, self.keywords, self.collection_time.isoformat()],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
     def to_dict(self, embeddings: bool = False) -> dict:
         """将证明材料项转换为字典"""
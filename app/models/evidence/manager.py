@@ -1,20 +1,24 @@
+import asyncio
+import numpy as np
 from typing import List, Dict, Optional
-from tqdm import tqdm
+from tqdm.asyncio import tqdm_asyncio
 import json
 from datetime import datetime
-import uuid
 from app.models.evidence.item import EvidenceItem
-from app.utils.maas_client import MaaSClient
+from app.utils.maas_client import AsyncMaaSClient, get_async_maas_client, run_on_background_loop, run_sync
 from app.models.evidence.prompt import DEFAULT_SUMMARY_PROMPT
-from app.database import get_database, store_evidence
+from app.database import delete_by_ids, get_database, hydrate_evidences, store_evidences, stored_evidence_ids
 
-database = get_database()  # 获取数据库实例
 
 class EvidenceManager:
     """证明材料管理类"""
     
     def __init__(self):
         self.evidences: List[EvidenceItem] = []
+        # 已写入数据库的证明材料ID及写入时的索引哈希，用于增量生成索引
+        self._indexed: Dict[str, str] = {}
+        # 串行化索引生成，只在后台事件循环中使用
+        self._index_lock = asyncio.Lock()
         print("Initializing EvidenceManager...")
         self.load_from_json()
         print(f"Loaded {len(self.evidences)} evidences")
@@ -22,18 +26,39 @@ class EvidenceManager:
         print("EvidenceManager initialization completed")
         
     def load_from_json(self, file_path: str = "data/evidence.json") -> None:
+        """从JSON文件加载证明材料（同步入口，在共享的后台事件循环中持有索引锁执行）
+        Args:
+            file_path: JSON 文件路径
+        """
+        run_sync(self.aload_from_json(file_path))
+
+    async def aload_from_json(self, file_path: str = "data/evidence.json") -> None:
+        """异步从JSON文件加载证明材料（可在任意事件循环中调用）
+
+        与生成索引持有同一把索引锁，索引过程中不会修改列表和已索引记录。
+        Args:
+            file_path: JSON 文件路径
+        """
+        async def locked():
+            async with self._index_lock:
+                await asyncio.to_thread(self._load_from_json, file_path)
+        await run_on_background_loop(locked())
+
+    def _load_from_json(self, file_path: str = "data/evidence.json") -> None:
         """
-        从 JSON 文件加载所有证明材料
+        从 JSON 文件加载证明材料，可重复调用：按ID去重，已加载的材料保留内存中的对象，
+        JSON中摘要或关键词有变化时替换为新内容
         :param file_path: JSON 文件路径
         """
         try:
             with open(file_path, "r", encoding="utf-8") as f:
                 data = json.load(f)
+            positions = {evidence.id: index for index, evidence in enumerate(self.evidences)}
+            added = 0
             # 转换为 EvidenceItem 对象
             for idx, item in enumerate(data):
                 # 为每个字段提供默认值，防止JSON数据缺失导致异常
                 evidence = EvidenceItem(
-                    id=str(uuid.uuid4()),  # 使用UUID作为ID
                     created_at=datetime.now().isoformat(),  # 设置当前时间为创建时间
                     filename=item.get("filename", "unknown"),
                     file_format=item.get("file_format", "unknown"),
@@ -45,9 +70,18 @@ class EvidenceManager:
                     summary=item.get("summary", ""),
                     keywords=item.get("keywords", [])
                 )
-                self.evidences.append(evidence)
+                # 使用内容哈希作为ID，重启后可识别数据库中已存储的材料
+                evidence.id = evidence.content_hash()
+                if evidence.id not in positions:
+                    positions[evidence.id] = len(self.evidences)
+                    self.evidences.append(evidence)
+                    added += 1
+                    continue
+                current = self.evidences[positions[evidence.id]]
+                if evidence.summary and (evidence.summary, evidence.keywords) != (current.summary, current.keywords):
+                    self.evidences[positions[evidence.id]] = evidence
 
-            print(f"Loaded {len(self.evidences)} evidences from {file_path}")
+            print(f"Loaded {added} new evidences from {file_path}, {len(self.evidences)} in total")
         except FileNotFoundError:
             print(f"Error: File not found at path {file_path}")
         except json.JSONDecodeError:
@@ -70,53 +104,152 @@ class EvidenceManager:
             print(f"Error saving evidences: {e}")
 
     def generate_index(self, summary_prompt: Optional[str] = None) -> None:
-        """生成证明材料索引"""
+        """生成证明材料索引（同步入口，在共享的后台事件循环中执行）"""
+        run_sync(self.agenerate_index(summary_prompt))
+
+    async def agenerate_index(self, summary_prompt: Optional[str] = None) -> None:
+        """异步生成证明材料索引（可在任意事件循环中调用）
+
+        与generate_index一样在后台事件循环中执行并持有同一把索引锁，
+        并发调用不会重复处理同一批材料或同时写入JSON文件。
+        """
+        async def locked():
+            async with self._index_lock:
+                await self._generate_index(summary_prompt)
+                await asyncio.to_thread(self._delete_orphans)
+        await run_on_background_loop(locked())
+
+    async def _generate_index(self, summary_prompt: Optional[str] = None) -> None:
+        """只处理新增或内容有变化的材料，摘要和向量请求并发执行"""
         
         if summary_prompt is None:
             summary_prompt = DEFAULT_SUMMARY_PROMPT
             
-        client = MaaSClient()
+        client = get_async_maas_client()
         
-        for evidence in tqdm(self.evidences, desc="Processing evidences", unit="evidence"):
-            if evidence.summary == "" or evidence.keywords == []:
-                # 构建提示词
-                prompt = summary_prompt.format(
-                    filename=evidence.filename,
-                    file_format=evidence.file_format,
-                    collection_time=evidence.collection_time,
-                    collector=evidence.collector,
-                    project=evidence.project,
-                    evidence_type=evidence.evidence_type,
-                    content=evidence.content
-                )
-                
-                # 调用大模型接口，指定JSON格式输出
-                response = client.chat_completion(prompt, output_format='json')
-                
-                # 更新摘要和关键词
-                evidence.summary = response['summary']
-                
-                # 处理keywords，兼容字符串和列表
-                keywords = response['keywords']
-                evidence.keywords = keywords.split(',') if isinstance(keywords, str) else keywords
-            
-            # 获取摘要和关键词的向量
-            evidence.summary_embedding = client.get_embeddings(evidence.summary)
-            evidence.keywords_embedding = client.get_embeddings(' '.join(evidence.keywords))
-            
-            # 将证明材料插入Elasticsearch
-            try:
-                evidence_dict = evidence.to_dict(embeddings=True)
-                # 确保embedding是列表格式
-                if isinstance(evidence_dict.get("keywords_embedding"), dict):
-                    evidence_dict["keywords_embedding"] = evidence_dict["keywords_embedding"]["vector"]
-                if isinstance(evidence_dict.get("summary_embedding"), dict):
-                    evidence_dict["summary_embedding"] = evidence_dict["summary_embedding"]["vector"]
-                
-                store_evidence(database = database, evidence = evidence_dict)
-            except Exception as e:
-                print(f"Error inserting evidence: {str(e)}")
-                raise
+        # 索引哈希与上次写入时一致的材料无需处理
+        dirty = list({
+            evidence.id: evidence for evidence in self.evidences
+            if self._indexed.get(evidence.id) != evidence.index_hash()
+        }.values())
+        # 本进程未写入过的材料（如重启前写入的数据）读取数据库中记录的索引哈希，
+        # 与当前内容一致才视为已索引；停机期间修改过摘要或关键词的材料会重新生成向量
+        untracked = [evidence for evidence in dirty if evidence.id not in self._indexed]
+        stored_hashes = await asyncio.to_thread(self._stored_index_hashes, untracked)
+        up_to_date = set()
+        for evidence in untracked:
+            if evidence.id in stored_hashes:
+                self._indexed[evidence.id] = stored_hashes[evidence.id]
+                if stored_hashes[evidence.id] == evidence.index_hash():
+                    up_to_date.add(evidence.id)
+        targets = [evidence for evidence in dirty if evidence.id not in up_to_date]
+        if up_to_date:
+            print(f"Skipped {len(up_to_date)} evidences already stored in database")
+        if not targets:
+            return
+        print(f"Indexing {len(targets)} new or changed evidences")
+        
+        pending = [evidence for evidence in targets if evidence.summary == "" or evidence.keywords == []]
+        results = await tqdm_asyncio.gather(
+            *(self._generate_summary(client, evidence, summary_prompt) for evidence in pending),
+            desc="Processing evidences", unit="evidence", return_exceptions=True
+        )
+        # 单条材料失败不影响其余材料写入，失败的材料保持未索引状态，下次生成索引时重试
+        failed = set()
+        for evidence, result in zip(pending, results):
+            if isinstance(result, Exception):
+                failed.add(evidence.id)
+                print(f"生成证明材料 {evidence.filename} 的摘要失败: {result}")
+        targets = [evidence for evidence in targets if evidence.id not in failed]
+        if not targets:
+            return
+        
+        # 批量获取摘要和关键词的向量
+        summary_embeddings, keywords_embeddings = await asyncio.gather(
+            client.get_embeddings([evidence.summary for evidence in targets]),
+            client.get_embeddings([' '.join(evidence.keywords) for evidence in targets])
+        )
+        
+        # 数据库写入为同步调用，放到线程中执行以免阻塞事件循环
+        await asyncio.to_thread(self._store_index, targets, summary_embeddings, keywords_embeddings)
+
+    @staticmethod
+    def _stored_index_hashes(evidences: List[EvidenceItem]) -> Dict[str, Optional[str]]:
+        """按项目分组回表，返回已存储材料的ID到写入时索引哈希的映射；启用分区时只加载涉及的项目分区
+
+        早期写入的记录没有索引哈希，值为None，会被重新索引一次。
+        """
+        by_project: Dict[str, List[str]] = {}
+        for evidence in evidences:
+            by_project.setdefault(evidence.project, []).append(evidence.id)
+        database = get_database()
+        stored_hashes: Dict[str, Optional[str]] = {}
+        for project, ids in by_project.items():
+            hydrated = hydrate_evidences(database, ids, fields=["index_hash"], project=project)
+            stored_hashes.update((data_id, metadata.get("index_hash")) for data_id, metadata in hydrated.items())
+        return stored_hashes
+
+    def _delete_orphans(self) -> None:
+        """删除数据库中已不在当前材料列表中的记录（如内容修改后ID变化留下的旧记录），避免被检索或导出
+
+        按当前材料涉及的项目逐个比对；材料列表为空时（如JSON加载失败）不做删除。
+        """
+        if not self.evidences:
+            return
+        current: Dict[str, set] = {}
+        for evidence in self.evidences:
+            current.setdefault(evidence.project, set()).add(evidence.id)
+        database = get_database()
+        orphans = []
+        for project, ids in current.items():
+            orphans += stored_evidence_ids(database, project=project) - ids
+        if not orphans:
+            return
+        deleted = delete_by_ids(orphans, collection_type="evidence")
+        for data_id in orphans:
+            self._indexed.pop(data_id, None)
+        print(f"Deleted {deleted} orphan evidences from database")
+
+    async def _generate_summary(self, client: AsyncMaaSClient, evidence: EvidenceItem, summary_prompt: str) -> None:
+        """调用大模型生成单个证明材料的摘要和关键词"""
+        # 构建提示词
+        prompt = summary_prompt.format(
+            filename=evidence.filename,
+            file_format=evidence.file_format,
+            collection_time=evidence.collection_time,
+            collector=evidence.collector,
+            project=evidence.project,
+            evidence_type=evidence.evidence_type,
+            content=evidence.content
+        )
+        
+        # 调用大模型接口，指定JSON格式输出
+        response = await client.chat_completion(prompt, output_format='json')
+        
+        # 更新摘要和关键词
+        evidence.summary = response['summary']
+        
+        # 处理keywords，兼容字符串和列表
+        keywords = response['keywords']
+        evidence.keywords = keywords.split(',') if isinstance(keywords, str) else keywords
+
+    def _store_index(self, evidences: List[EvidenceItem], summary_embeddings: List[np.ndarray], keywords_embeddings: List[np.ndarray]) -> None:
+        """写入向量并将证明材料批量插入数据库"""
+        for evidence, summary_embedding, keywords_embedding in zip(evidences, summary_embeddings, keywords_embeddings):
+            evidence.summary_embedding = summary_embedding
+            evidence.keywords_embedding = keywords_embedding
+        
+        # 按列批量写入，每批一次insert请求
+        try:
+            # 索引哈希随记录写入metadata，重启后据此判断材料是否需要重新索引
+            store_evidences(database = get_database(), evidences = [
+                {**evidence.to_dict(embeddings=True), "index_hash": evidence.index_hash()} for evidence in evidences
+            ])
+        except Exception as e:
+            print(f"Error inserting evidences: {str(e)}")
+            raise
+        for evidence in evidences:
+            self._indexed[evidence.id] = evidence.index_hash()
         
         # 保存更新后的证明材料到JSON文件
         self.save_to_json()
@@ -1,23 +1,25 @@
+import asyncio
 from typing import List, Dict, Optional
 from openai import embeddings
-from tqdm import tqdm
+from tqdm.asyncio import tqdm_asyncio
 from datetime import datetime
 import uuid
 from app.models.report.item import ReportItem
 from app.models.report.prompt import DEFAULT_REPORT_PROMPT
 from app.models.evidence.item import EvidenceItem
 from app.models.evaluation_spec.item import EvaluationSpecItem
-from app.utils.maas_client import MaaSClient
-from app.database import get_database, search_evaluation_spec, retrieve_evidence_by_spec, dump_evaluation_spec
+from app.utils.maas_client import AsyncMaaSClient, get_async_maas_client, run_sync
+from app.database import get_database, search_evaluation_spec, retrieve_evidence_by_spec, retrieve_evidence_by_specs, iter_dump_evaluation_spec, hydrate_evidences
 import app.config as config
 
+# add_report_item构建EvidenceItem时读取的证明材料字段，回表时只取这些键
+REPORT_EVIDENCE_FIELDS = ['id', 'filename', 'file_format', 'collection_time', 'collector', 'project',
+                          'evidence_type', 'content', 'keywords', 'summary']
 
-database = get_database()  # 获取数据库实例
 
 class ReportManager:
     def __init__(self, evaluation_spec_index: str = None, evidence_index:str = None):
         self.reports: List[ReportItem] = []
-        self.client = MaaSClient()
         
     def get_report(self, index: int = 0) -> Optional[Dict]:
         """根据索引获取单条报告
@@ -78,16 +80,39 @@ class ReportManager:
         return markdown
 
     def generate_report(self) -> Dict:
-        """生成完整报告
+        """生成完整报告（同步入口，在共享的后台事件循环中执行）
+        Returns:
+            返回包含运行状态和错误信息的字典
+        """
+        return run_sync(self.agenerate_report())
+
+    async def agenerate_report(self) -> Dict:
+        """异步生成完整报告，各报告项并发生成结论
         Returns:
             返回包含运行状态和错误信息的字典
         """
         try:
-            for report in tqdm(self.reports, desc="Processing Reports", unit="report"):
-                self.generate_report_item_conclusion(report)
+            client = get_async_maas_client()
+            results = await tqdm_asyncio.gather(
+                *(self.generate_report_item_conclusion(client, report) for report in self.reports),
+                desc="Processing Reports", unit="report", return_exceptions=True
+            )
+            # 单个报告项失败不影响其余报告项，失败项在结论中记录原因
+            failed = 0
+            for report, result in zip(self.reports, results):
+                if isinstance(result, Exception):
+                    failed += 1
+                    report.is_qualified = False
+                    report.conclusion = f"结论生成失败: {str(result)}"
+                    print(f"评估规范 {report.spec.id} 的结论生成失败: {str(result)}")
+            if failed and failed == len(self.reports):
+                return {
+                    "success": False,
+                    "message": f"报告生成失败: 全部 {failed} 个报告项均未生成结论"
+                }
             return {
                 "success": True,
-                "message": "报告生成成功"
+                "message": f"报告生成成功，{failed} 个报告项生成失败" if failed else "报告生成成功"
             }
         except Exception as e:
             return {
@@ -95,7 +120,7 @@ class ReportManager:
                 "message": f"报告生成失败: {str(e)}"
             }
 
-    def generate_report_item_conclusion(self, report: ReportItem) -> None:
+    async def generate_report_item_conclusion(self, client: AsyncMaaSClient, report: ReportItem) -> None:
         """生成单个报告项的结论
         1. 召回证明材料
         2. 调用大模型生成评估结论
@@ -105,8 +130,9 @@ class ReportManager:
         if not report.evidences:
             try: 
                 # 使用向量相似度查询召回证明材料
-                evidences = retrieve_evidence_by_spec(
-                    database = database,
+                evidences = await asyncio.to_thread(
+                    retrieve_evidence_by_spec,
+                    database = get_database(),
                     spec=report.spec.to_dict(embeddings=True)
                 )
                 
@@ -131,20 +157,16 @@ class ReportManager:
         )
         
         # 调用大模型生成结论
-        response = self.client.chat_completion(prompt, output_format='json')
+        response = await client.chat_completion(prompt, output_format='json')
         
         # 更新报告项
         report.is_qualified = response['is_qualified']
         report.conclusion = response['conclusion']
 
-    def add_report_item(self, spec: str) -> ReportItem:
-        """添加报告项
-        2. 召回相关证明材料
-        3. 创建报告项
-        """
-        print(spec.keys())
-        # 召回证明材料
-        spec=EvaluationSpecItem(
+    @staticmethod
+    def _spec_from_record(spec: Dict) -> EvaluationSpecItem:
+        """将数据库中的评估规范记录转换为EvaluationSpecItem"""
+        return EvaluationSpecItem(
             id=spec['id'],
             primary_title = spec['metadata']['primary_title'],
             secondary_title = spec['metadata']['secondary_title'],
@@ -156,9 +178,19 @@ class ReportManager:
             summary = spec['metadata'].get('summary', ""),
             summary_embedding = spec['summary_embedding']
         )
+
+    def add_report_item(self, spec: Dict, evidences_dict_list: Optional[List[Dict]] = None) -> ReportItem:
+        """添加报告项
+        1. 转换评估规范
+        2. 召回相关证明材料（未传入召回结果时单独检索）
+        3. 创建报告项
+        """
+        print(spec.keys())
+        spec = self._spec_from_record(spec)
         
-        
-        evidences_dict_list = retrieve_evidence_by_spec(database = database, spec = spec.to_dict(embeddings = True))
+        # 召回证明材料
+        if evidences_dict_list is None:
+            evidences_dict_list = retrieve_evidence_by_spec(database = get_database(), spec = spec.to_dict(embeddings = True))
         
         evidence_item_list = []
         for evidece_dict in evidences_dict_list:
@@ -172,26 +204,30 @@ class ReportManager:
                 evidence_type = evidece_dict['metadata']['evidence_type'],
                 content = evidece_dict['metadata']['content'],
                 keywords = evidece_dict['metadata'].get('keywords', []),
-                keywords_embedding = evidece_dict['metadata']['keywords_embedding'],
+                keywords_embedding = evidece_dict['metadata'].get('keywords_embedding'),
                 summary = evidece_dict['metadata'].get('summary', ""),
-                summary_embedding = evidece_dict['metadata']['summary_embedding']
+                summary_embedding = evidece_dict['metadata'].get('summary_embedding')
             )
             evidence_item_list.append(evidence_item)
             
-        print(evidence_item_list[0].to_dict(embeddings = False))
+        if evidence_item_list:
+            print(evidence_item_list[0].to_dict(embeddings = False))
         # 创建报告项
         report_item = ReportItem(spec = spec, evidences=evidence_item_list)
         
         self.reports.append(report_item)
         return report_item
     
-    def load_data(self) -> Dict:
+    def load_data(self, project: Optional[str] = None) -> Dict:
         """使用测试数据初始化报告管理器
         
         1. 从测试索引中获取所有评估规范ID
         2. 为每个评估规范创建报告项
         3. 生成完整的测试报告
         
+        Args:
+            project: 指定项目时只召回该项目的证明材料，默认检索全部项目
+        
         Returns:
             包含操作结果的字典，包含success和message键
         """
@@ -199,10 +235,31 @@ class ReportManager:
         self.reports = []  # 清空现有报告
         
         try:
-            # 使用新的dump_evaluation_spec接口获取所有评估规范
-            specs = dump_evaluation_spec(database = database)
+            # 分页流式读取评估规范，每页的证明材料在一次批量检索中召回
+            database = get_database()
+            spec_count = 0
+            for specs in iter_dump_evaluation_spec(database = database):
+                spec_count += len(specs)
+                # 检索只取回id和score，同一页内被多个规范召回的证明材料只回表一次
+                hits_list = retrieve_evidence_by_specs(database = database, specs = specs, project = project, output_fields = [])
+                hydrated = hydrate_evidences(database, [hit["id"] for hits in hits_list for hit in hits],
+                                             fields = REPORT_EVIDENCE_FIELDS, project = project)
+                evidences_list = [
+                    [{**hit, "metadata": hydrated[hit["id"]]} for hit in hits if hit["id"] in hydrated]
+                    for hits in hits_list
+                ]
+                
+                # 为每个spec_id添加报告项
+                for spec, evidences_dict_list in zip(specs, evidences_list):
+                    try:
+                        print(f"正在为评估规范 {spec['id']} 创建报告项...")
+                        report_item = self.add_report_item(spec, evidences_dict_list)
+                        print(f"成功为评估规范 {spec['id']} 创建报告项")
+                        print(f"报告项详情: spec={report_item.spec.id}, evidences={len(report_item.evidences)}")
+                    except Exception as e:
+                        print(f"为评估规范 {spec['id']} 创建报告项失败: {str(e)}")
             
-            if not specs:
+            if spec_count == 0:
                 error_msg = "数据库中没有任何评估规范"
                 print(f"警告: {error_msg}")
                 return {
@@ -210,18 +267,7 @@ class ReportManager:
                     "message": error_msg
                 }
                 
-            print(f"找到 {len(specs)} 个评估规范。")
-            
-            # 为每个spec_id添加报告项
-            for spec in specs:
-                try:
-                    print(f"正在为评估规范 {spec['id']} 创建报告项...")
-                    report_item = self.add_report_item(spec)
-                    print(f"成功为评估规范 {spec['id']} 创建报告项")
-                    print(f"报告项详情: spec={report_item.spec.id}, evidences={len(report_item.evidences)}")
-                except Exception as e:
-                    print(f"为评估规范 {spec['id']} 创建报告项失败: {str(e)}")
-                    
+            print(f"找到 {spec_count} 个评估规范。")
             print(f"初始化完成，当前报告总数: {len(self.reports)}")
             return {
                 "success": True,
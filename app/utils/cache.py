@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+from app.config.__init__ import get_config
+
+config = get_config()
+
+
+class _SQLiteCache:
+    """SQLite持久化缓存基类，负责连接管理、容量淘汰和命中统计
+
+    子类需提供表名及建表语句，表中必须包含 key 主键和 accessed_at 访问时间列。
+    """
+
+    table: str = ""
+    schema: str = ""
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(self.schema)
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_accessed_at ON {self.table} (accessed_at)")
+        self._conn.commit()
+
+    def _evict(self) -> None:
+        """淘汰超出容量上限的最久未访问条目（调用方需持有锁）"""
+        count = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,)
+            )
+            self.evictions += overflow
+
+    def stats(self) -> Dict[str, float]:
+        """返回缓存命中统计"""
+        with self._lock:
+            size = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "size": size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / total if total else 0.0
+        }
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingCache(_SQLiteCache):
+    """基于SQLite的持久化嵌入向量缓存
+
+    以 模型名 + 向量维度 + 文本哈希 作为键，向量以float32字节存储。
+    条目数超过上限时按最近访问时间淘汰最旧的条目。
+    """
+
+    table = "embeddings"
+    schema = """CREATE TABLE IF NOT EXISTS embeddings (
+        key TEXT PRIMARY KEY,
+        model TEXT NOT NULL,
+        dimensions INTEGER NOT NULL,
+        vector BLOB NOT NULL,
+        accessed_at REAL NOT NULL
+    )"""
+
+    def __init__(self, path: str, max_entries: int = 200000):
+        super().__init__(path, max_entries)
+
+    @staticmethod
+    def make_key(text: str, model: str, dimensions: int) -> str:
+        """计算缓存键"""
+        return hashlib.sha256(f"{model}\x00{dimensions}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: Sequence[str], model: str, dimensions: int) -> Dict[str, np.ndarray]:
+        """批量查询缓存
+        Args:
+            texts: 文本列表
+            model: 模型名称
+            dimensions: 向量维度
+        Returns:
+            命中的 文本 -> 向量 映射
+        """
+        keys = {self.make_key(text, model, dimensions): text for text in set(texts)}
+        if not keys:
+            return {}
+
+        found = {}
+        with self._lock:
+            key_list = list(keys)
+            # SQLite单条语句的参数个数有限，分段查询
+            for start in range(0, len(key_list), 500):
+                chunk = key_list[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[keys[key]] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET accessed_at = ? WHERE key = ?",
+                    [(now, self.make_key(text, model, dimensions)) for text in found]
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: Dict[str, Sequence[float]], model: str, dimensions: int) -> None:
+        """批量写入缓存
+        Args:
+            items: 文本 -> 向量 映射
+            model: 模型名称
+            dimensions: 向量维度
+        """
+        if not items:
+            return
+        now = time.time()
+        rows = [
+            (self.make_key(text, model, dimensions), model, dimensions, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in items.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dimensions, vector, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._evict()
+            self._conn.commit()
+
+
+class CompletionCache(_SQLiteCache):
+    """基于SQLite的持久化大模型响应缓存
+
+    以 模型名 + 输出格式 + 消息列表哈希 作为键，缓存模型返回的原始文本。
+    条目超过TTL视为失效，条目数超过上限时按最近访问时间淘汰。
+    """
+
+    table = "completions"
+    schema = """CREATE TABLE IF NOT EXISTS completions (
+        key TEXT PRIMARY KEY,
+        model TEXT NOT NULL,
+        content TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        accessed_at REAL NOT NULL
+    )"""
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl: float = 7 * 24 * 3600):
+        super().__init__(path, max_entries)
+        self.ttl = ttl
+
+    @staticmethod
+    def make_key(messages: List[Dict[str, Any]], model: str, output_format: Optional[str]) -> str:
+        """计算缓存键"""
+        payload = json.dumps(messages, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(f"{model}\x00{output_format}\x00{payload}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """查询缓存，未命中或已过期时返回None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT content, created_at FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, model: str, content: str) -> None:
+        """写入缓存"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, model, content, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, model or "", content, now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_completion_cache: Optional[CompletionCache] = None
+_cache_init_lock = threading.Lock()
+# fork前创建的缓存实例，子进程中只保留引用不再使用
+_inherited_caches: List[Any] = []
+
+
+def _reset_after_fork() -> None:
+    # SQLite连接不能跨fork使用，锁也可能在fork时处于持有状态，子进程首次使用时重新打开；
+    # 继承的连接不关闭，避免子进程回收连接时影响父进程仍在使用的数据库文件
+    global _embedding_cache, _completion_cache, _cache_init_lock
+    _inherited_caches.extend(cache for cache in (_embedding_cache, _completion_cache) if cache is not None)
+    _embedding_cache, _completion_cache = None, None
+    _cache_init_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """获取进程内共享的嵌入缓存，未启用时返回None"""
+    global _embedding_cache
+    if not config.EMBEDDING_CACHE_ENABLED:
+        return None
+    with _cache_init_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache(config.EMBEDDING_CACHE_PATH, config.EMBEDDING_CACHE_MAX_ENTRIES)
+    return _embedding_cache
+
+
+def get_completion_cache() -> Optional[CompletionCache]:
+    """获取进程内共享的大模型响应缓存，未启用时返回None"""
+    global _completion_cache
+    if not config.LLM_CACHE_ENABLED:
+        return None
+    with _cache_init_lock:
+        if _completion_cache is None:
+            _completion_cache = CompletionCache(config.LLM_CACHE_PATH, config.LLM_CACHE_MAX_ENTRIES, config.LLM_CACHE_TTL)
+    return _completion_cache
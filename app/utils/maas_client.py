@@ -1,125 +1,635 @@
-from typing import Literal
-from openai import OpenAI
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import weakref
+import numpy as np
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Coroutine, Dict, List, Literal, Optional, Tuple, Union
+import httpx
+from openai import APIConnectionError, APIStatusError, APITimeoutError, AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, InternalServerError, OpenAI, RateLimitError
 from app.config.__init__ import get_config
+from app.utils.cache import CompletionCache, get_completion_cache, get_embedding_cache
+from app.utils.metrics import maas_metrics
+from app.utils.singleflight import AsyncSingleFlight, SingleFlight, make_request_key
 import base64
 
 config = get_config()
 
+
+class RateLimiter:
+    """令牌桶限流器，同时限制每分钟请求数和每分钟token数
+
+    采用预留额度的方式：每次调用先扣减额度（允许为负），再按欠额计算需要等待的时间，
+    因此可在多线程和多个事件循环之间共享同一实例。限额为0表示不限制。
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int) -> float:
+        """预留一次请求的额度，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._updated = now
+            wait = 0.0
+            if self.requests_per_minute > 0:
+                rate = self.requests_per_minute / 60
+                self._requests = min(self.requests_per_minute, self._requests + elapsed * rate) - 1
+                wait = max(wait, -self._requests / rate)
+            if self.tokens_per_minute > 0:
+                rate = self.tokens_per_minute / 60
+                self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * rate) - tokens
+                wait = max(wait, -self._tokens / rate)
+            return wait
+
+    def acquire(self, tokens: int = 0) -> None:
+        """阻塞直到额度可用"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0) -> None:
+        """异步等待直到额度可用"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+# 进程内所有客户端共享的限流器，按接口区分
+rate_limiters: Dict[str, RateLimiter] = {
+    "llm": RateLimiter(config.LLM_RPM, config.LLM_TPM),
+    "vlm": RateLimiter(config.VLM_RPM, config.VLM_TPM),
+    "embedding": RateLimiter(config.EMBEDDING_RPM, config.EMBEDDING_TPM),
+}
+
+# 进程内共享的同步请求合并器，相同的并发请求只发送一次
+inflight_requests = SingleFlight()
+
+# 可重试的错误：限流、超时、连接失败和服务端5xx
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+# 图片输入的token数估算值
+IMAGE_TOKEN_ESTIMATE = 1024
+
+
+def _estimate_tokens(payload: Any) -> int:
+    """粗略估算请求的token数，用于TPM限流"""
+    if isinstance(payload, str):
+        return len(payload) // 2 + 1
+    return len(json.dumps(payload, ensure_ascii=False)) // 2 + 1
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """从错误响应中读取Retry-After（秒）"""
+    if not isinstance(error, APIStatusError):
+        return None
+    headers = error.response.headers
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_delay(attempt: int, error: Exception) -> float:
+    """计算第attempt次重试前的等待时间：带全抖动的指数退避，且不少于Retry-After"""
+    backoff = min(config.MAAS_RETRY_MAX_DELAY, config.MAAS_RETRY_BASE_DELAY * 2 ** attempt)
+    delay = random.uniform(0, backoff)
+    retry_after = _retry_after(error)
+    return max(delay, retry_after) if retry_after is not None else delay
+
+
+def _usage_tokens(response) -> Tuple[int, int]:
+    """读取响应中的 (prompt_tokens, completion_tokens)"""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return 0, 0
+    return getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0
+
+
+def _call_with_retry(endpoint: str, model: Optional[str], tokens: int, func: Callable[[], Any]) -> Any:
+    """经限流器调用func，遇到可重试错误时退避重试，并记录调用统计"""
+    limiter = rate_limiters[endpoint]
+    started = time.perf_counter()
+    for attempt in range(config.MAAS_MAX_RETRIES + 1):
+        limiter.acquire(tokens)
+        try:
+            response = func()
+        except Exception as e:
+            maas_metrics.record_error(endpoint, e)
+            if not isinstance(e, RETRYABLE_ERRORS) or attempt >= config.MAAS_MAX_RETRIES:
+                maas_metrics.record_call(endpoint, model, (time.perf_counter() - started) * 1000, retries=attempt, error=e)
+                raise
+            delay = _retry_delay(attempt, e)
+            print(f"{endpoint}请求失败（{type(e).__name__}），{delay:.1f}秒后第{attempt + 1}次重试")
+            time.sleep(delay)
+        else:
+            maas_metrics.record_call(endpoint, model, (time.perf_counter() - started) * 1000, *_usage_tokens(response), retries=attempt)
+            return response
+
+
+async def _acall_with_retry(endpoint: str, model: Optional[str], tokens: int, func: Callable[[], Any]) -> Any:
+    """_call_with_retry的异步版本，func返回协程"""
+    limiter = rate_limiters[endpoint]
+    started = time.perf_counter()
+    for attempt in range(config.MAAS_MAX_RETRIES + 1):
+        await limiter.acquire_async(tokens)
+        try:
+            response = await func()
+        except Exception as e:
+            maas_metrics.record_error(endpoint, e)
+            if not isinstance(e, RETRYABLE_ERRORS) or attempt >= config.MAAS_MAX_RETRIES:
+                maas_metrics.record_call(endpoint, model, (time.perf_counter() - started) * 1000, retries=attempt, error=e)
+                raise
+            delay = _retry_delay(attempt, e)
+            print(f"{endpoint}请求失败（{type(e).__name__}），{delay:.1f}秒后第{attempt + 1}次重试")
+            await asyncio.sleep(delay)
+        else:
+            maas_metrics.record_call(endpoint, model, (time.perf_counter() - started) * 1000, *_usage_tokens(response), retries=attempt)
+            return response
+
+
+def _prepare_messages(messages, output_format=None) -> List[Dict[str, Any]]:
+    """规范化消息列表，JSON输出时添加系统提示"""
+    # 确保messages是列表格式
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+
+    # 如果指定了JSON格式输出，添加系统提示
+    if output_format == 'json':
+        messages.insert(0, {
+            "role": "system",
+            "content": "请始终以JSON格式返回结果"
+        })
+    return messages
+
+
+def _extract_content(response) -> str:
+    """从模型响应中提取文本内容"""
+    content = response.choices[0].message.content
+    return content[content.find('{'):content.rfind('}')+1] if '{' in content and '}' in content else content
+
+
+def _parse_content(content: str, output_format=None) -> Tuple[Dict[str, Any], bool]:
+    """解析模型返回内容
+    Returns:
+        (解析结果, 是否解析成功)
+    """
+    if output_format == 'json':
+        try:
+            return json.loads(content), True
+        except json.JSONDecodeError as e:
+            print(f"JSON解析失败: {e}")
+            print(f"原始响应内容: {content}")
+            return {
+                'error': 'Invalid JSON response',
+                'content': content
+            }, False
+    return {
+        'text': content
+    }, True
+
+
+def _build_vision_messages(image_path: str, prompt: str) -> List[Dict[str, Any]]:
+    """构建包含base64图片的VLM消息"""
+    with open(image_path, "rb") as image_file:
+        base64_image = base64.b64encode(image_file.read()).decode("utf-8")
+
+    return [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": prompt},
+                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
+            ]
+        }
+    ]
+
+
+def _decode_embedding(embedding: Union[str, List[float]]) -> np.ndarray:
+    """将base64或浮点列表格式的向量转换为float32数组"""
+    if isinstance(embedding, str):
+        return np.frombuffer(base64.b64decode(embedding), dtype=np.float32)
+    return np.asarray(embedding, dtype=np.float32)
+
+
+def _sorted_embeddings(response) -> List[np.ndarray]:
+    """按index字段还原输入顺序（服务端不保证返回顺序），并解码为float32数组"""
+    return [_decode_embedding(item.embedding) for item in sorted(response.data, key=lambda item: item.index)]
+
+
+def _http_limits() -> httpx.Limits:
+    """连接池配置：最大连接数、保活连接数和保活时长"""
+    return httpx.Limits(
+        max_connections=config.MAAS_MAX_CONNECTIONS,
+        max_keepalive_connections=config.MAAS_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=config.MAAS_KEEPALIVE_EXPIRY
+    )
+
+
+def _http_timeout() -> httpx.Timeout:
+    """请求超时配置"""
+    return httpx.Timeout(config.MAAS_TIMEOUT, connect=config.MAAS_CONNECT_TIMEOUT)
+
+
 class MaaSClient:
+    """同步MaaS客户端，三个接口共用一个HTTP连接池
+
+    进程内请通过get_maas_client获取共享实例，避免重复建立连接。
+    """
+
     def __init__(self):
+        self.http_client = DefaultHttpxClient(limits=_http_limits(), timeout=_http_timeout())
         self.llm_client = OpenAI(
             api_key=config.LLM_API_KEY,
-            base_url=config.LLM_BASE_URL
+            base_url=config.LLM_BASE_URL,
+            max_retries=0,
+            http_client=self.http_client
         )
         self.vlm_client = OpenAI(
             api_key=config.VLM_API_KEY,
-            base_url=config.VLM_BASE_URL
+            base_url=config.VLM_BASE_URL,
+            max_retries=0,
+            http_client=self.http_client
         )
         self.embedding_client = OpenAI(
             api_key=config.EMBEDDING_API_KEY,
-            base_url=config.EMBEDDING_BASE_URL
+            base_url=config.EMBEDDING_BASE_URL,
+            max_retries=0,
+            http_client=self.http_client
         )
 
-    def chat_completion(self, messages, model=None, output_format=None):
-        # 确保messages是列表格式
-        if isinstance(messages, str):
-            messages = [{"role": "user", "content": messages}]
-        
-        # 如果指定了JSON格式输出，添加系统提示
-        if output_format == 'json':
-            messages.insert(0, {
-                "role": "system",
-                "content": "请始终以JSON格式返回结果"
-            })
-            
-        response = self.llm_client.chat.completions.create(
-            messages=messages,
-            model=model or config.LLM_MODEL,
-            response_format={"type": "json_object"} if output_format == 'json' else None
-        )
-        
-        # 解析响应
-        content = response.choices[0].message.content
-        content = content[content.find('{'):content.rfind('}')+1] if '{' in content and '}' in content else content
-        # print(content)
-        if output_format == 'json':
-            import json
-            try:
-                return json.loads(content)
-            except json.JSONDecodeError as e:
-                print(f"JSON解析失败: {e}")
-                print(f"原始响应内容: {content}")
-                return {
-                    'error': 'Invalid JSON response',
-                    'content': content
-                }
-        return {
-            'text': content
-        }
+    def close(self) -> None:
+        """关闭HTTP连接池"""
+        self.http_client.close()
+
+    def chat_completion(self, messages, model=None, output_format=None, use_cache: bool = True):
+        """调用大模型生成回复
+        Args:
+            messages: 消息列表或单条用户提示词
+            model: 模型名称，可选
+            output_format: 输出格式，'json'表示解析为字典
+            use_cache: 是否使用响应缓存（需配置LLM_CACHE_ENABLED开启），传False时强制请求模型
+        Returns:
+            JSON格式时返回解析后的字典，否则返回{'text': 内容}
+        """
+        messages = _prepare_messages(messages, output_format)
+        model = model or config.LLM_MODEL
+        cache = get_completion_cache()
+        cache_key = CompletionCache.make_key(messages, model, output_format) if cache else None
+        content = cache.get(cache_key) if cache and use_cache else None
+
+        cached = content is not None
+        if cached:
+            maas_metrics.record_cache_hit("llm")
+        else:
+            def create():
+                return _extract_content(_call_with_retry("llm", model, _estimate_tokens(messages), lambda: self.llm_client.chat.completions.create(
+                    messages=messages,
+                    model=model,
+                    response_format={"type": "json_object"} if output_format == 'json' else None
+                )))
+            # 相同的并发请求只发送一次，各调用方分别解析结果
+            content = inflight_requests.do(make_request_key("llm", model, output_format, messages), create)
+
+        result, ok = _parse_content(content, output_format)
+        # 只缓存能够正常解析的响应
+        if cache and ok and not cached:
+            cache.put(cache_key, model, content)
+        return result
 
     def vision_completion(self, image_path: str, prompt: str = "Describe this image.", model=None):
         """
         Generate a description for an image using a Vision-Language Model (VLM).
-        
+
         Args:
             image_path (str): Path to the image file.
             prompt (str): Optional prompt to guide the VLM.
             model: Optional model name.
-        
+
         Returns:
             str: Description of the image.
         """
-        with open(image_path, "rb") as image_file:
-            base64_image = base64.b64encode(image_file.read()).decode("utf-8")
-        
-        messages = [
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
-                ]
-            }
-        ]
-        
-        response = self.vlm_client.chat.completions.create(
-            messages=messages,
-            model=model or config.VLM_MODEL
-        )
-        
-        return response.choices[0].message.content.strip()
+        messages = _build_vision_messages(image_path, prompt)
+        model = model or config.VLM_MODEL
 
-    def get_embeddings(self, input, model=None, dimensions=1024, encoding_format: Literal['float', 'base64'] = "float"):
+        def create():
+            response = _call_with_retry("vlm", model, _estimate_tokens(prompt) + IMAGE_TOKEN_ESTIMATE, lambda: self.vlm_client.chat.completions.create(
+                messages=messages,
+                model=model
+            ))
+            return response.choices[0].message.content.strip()
+        return inflight_requests.do(make_request_key("vlm", model, messages), create)
+
+    def get_embeddings(self, input: Union[str, List[str]], model=None, dimensions=1024, encoding_format: Optional[Literal['float', 'base64']] = None, batch_size: Optional[int] = None):
         """获取文本的嵌入向量
         Args:
-            input: 输入文本
+            input: 输入文本，或文本列表（批量模式）
             model: 模型名称，可选
             dimensions: 向量维度，默认1024
-            encoding_format: 编码格式，默认"float"
+            encoding_format: 传输编码格式，默认取配置EMBEDDING_ENCODING_FORMAT；base64可减小响应体积和解析开销
+            batch_size: 批量模式下每次请求的文本数，默认取配置EMBEDDING_BATCH_SIZE
         Returns:
-            返回嵌入向量
+            输入为文本时返回单个float32向量；输入为列表时按输入顺序返回向量列表
         """
-        return self.embedding_client.embeddings.create(
-            input=input,
-            model=model or config.EMBEDDING_MODEL or "text-embedding-v3",
-            dimensions=dimensions,
-            encoding_format=encoding_format
-        ).data[0].embedding
+        single = isinstance(input, str)
+        texts = [input] if single else list(input)
+        model = model or config.EMBEDDING_MODEL or "text-embedding-v3"
+        batch_size = batch_size or config.EMBEDDING_BATCH_SIZE
+        encoding_format = encoding_format or config.EMBEDDING_ENCODING_FORMAT
+
+        # 先查询本地缓存，只对未命中的文本（去重后）发起请求
+        cache = get_embedding_cache()
+        vectors = cache.get_many(texts, model, dimensions) if cache else {}
+        missing = [text for text in dict.fromkeys(texts) if text not in vectors]
+        if vectors:
+            maas_metrics.record_cache_hit("embedding", len(vectors))
+
+        fetched = {}
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            fetched.update(zip(batch, self._create_embeddings(batch, model, dimensions, encoding_format)))
+        if cache:
+            cache.put_many(fetched, model, dimensions)
+        vectors.update(fetched)
+
+        embeddings = [vectors[text] for text in texts]
+        return embeddings[0] if single else embeddings
+
+    def _create_embeddings(self, texts: List[str], model, dimensions, encoding_format) -> List[np.ndarray]:
+        """发起单次嵌入请求，并按输入顺序返回向量"""
+        def create():
+            return _sorted_embeddings(_call_with_retry("embedding", model, _estimate_tokens("".join(texts)), lambda: self.embedding_client.embeddings.create(
+                input=texts,
+                model=model,
+                dimensions=dimensions,
+                encoding_format=encoding_format
+            )))
+        return inflight_requests.do(make_request_key("embedding", model, dimensions, encoding_format, texts), create)
+
+
+class AsyncMaaSClient:
+    """基于异步OpenAI客户端的MaaS客户端
+
+    LLM、VLM、Embedding三类接口共用一个HTTP连接池，分别由信号量限制并发请求数，
+    与MaaSClient共用响应缓存和嵌入缓存。实例绑定创建时的事件循环，
+    请通过get_async_maas_client获取当前事件循环对应的实例。
+    """
+
+    def __init__(self):
+        self.http_client = DefaultAsyncHttpxClient(limits=_http_limits(), timeout=_http_timeout())
+        self.llm_client = AsyncOpenAI(
+            api_key=config.LLM_API_KEY,
+            base_url=config.LLM_BASE_URL,
+            max_retries=0,
+            http_client=self.http_client
+        )
+        self.vlm_client = AsyncOpenAI(
+            api_key=config.VLM_API_KEY,
+            base_url=config.VLM_BASE_URL,
+            max_retries=0,
+            http_client=self.http_client
+        )
+        self.embedding_client = AsyncOpenAI(
+            api_key=config.EMBEDDING_API_KEY,
+            base_url=config.EMBEDDING_BASE_URL,
+            max_retries=0,
+            http_client=self.http_client
+        )
+        self.llm_semaphore = asyncio.Semaphore(config.LLM_CONCURRENCY)
+        self.vlm_semaphore = asyncio.Semaphore(config.VLM_CONCURRENCY)
+        self.embedding_semaphore = asyncio.Semaphore(config.EMBEDDING_CONCURRENCY)
+        self.inflight_requests = AsyncSingleFlight()
+
+    async def aclose(self) -> None:
+        """关闭HTTP连接池"""
+        await self.http_client.aclose()
+
+    async def chat_completion(self, messages, model=None, output_format=None, use_cache: bool = True):
+        """异步调用大模型生成回复，参数与MaaSClient.chat_completion一致"""
+        messages = _prepare_messages(messages, output_format)
+        model = model or config.LLM_MODEL
+        cache = get_completion_cache()
+        cache_key = CompletionCache.make_key(messages, model, output_format) if cache else None
+        # SQLite缓存的读写放到线程中执行，避免阻塞事件循环
+        content = await asyncio.to_thread(cache.get, cache_key) if cache and use_cache else None
+
+        cached = content is not None
+        if cached:
+            maas_metrics.record_cache_hit("llm")
+        else:
+            async def create():
+                async with self.llm_semaphore:
+                    return await self.llm_client.chat.completions.create(
+                        messages=messages,
+                        model=model,
+                        response_format={"type": "json_object"} if output_format == 'json' else None
+                    )
+
+            async def fetch():
+                return _extract_content(await _acall_with_retry("llm", model, _estimate_tokens(messages), create))
+            # 相同的并发请求只发送一次，各调用方分别解析结果
+            content = await self.inflight_requests.do(make_request_key("llm", model, output_format, messages), fetch)
+
+        result, ok = _parse_content(content, output_format)
+        # 只缓存能够正常解析的响应
+        if cache and ok and not cached:
+            await asyncio.to_thread(cache.put, cache_key, model, content)
+        return result
+
+    async def vision_completion(self, image_path: str, prompt: str = "Describe this image.", model=None) -> str:
+        """异步调用VLM生成图片描述，参数与MaaSClient.vision_completion一致"""
+        messages = _build_vision_messages(image_path, prompt)
+        model = model or config.VLM_MODEL
+
+        async def create():
+            async with self.vlm_semaphore:
+                return await self.vlm_client.chat.completions.create(
+                    messages=messages,
+                    model=model
+                )
+
+        async def fetch():
+            response = await _acall_with_retry("vlm", model, _estimate_tokens(prompt) + IMAGE_TOKEN_ESTIMATE, create)
+            return response.choices[0].message.content.strip()
+        return await self.inflight_requests.do(make_request_key("vlm", model, messages), fetch)
+
+    async def get_embeddings(self, input: Union[str, List[str]], model=None, dimensions=1024, encoding_format: Optional[Literal['float', 'base64']] = None, batch_size: Optional[int] = None):
+        """异步获取文本的嵌入向量，各批次并发请求，参数与MaaSClient.get_embeddings一致"""
+        single = isinstance(input, str)
+        texts = [input] if single else list(input)
+        model = model or config.EMBEDDING_MODEL or "text-embedding-v3"
+        batch_size = batch_size or config.EMBEDDING_BATCH_SIZE
+        encoding_format = encoding_format or config.EMBEDDING_ENCODING_FORMAT
+
+        cache = get_embedding_cache()
+        vectors = await asyncio.to_thread(cache.get_many, texts, model, dimensions) if cache else {}
+        missing = [text for text in dict.fromkeys(texts) if text not in vectors]
+        if vectors:
+            maas_metrics.record_cache_hit("embedding", len(vectors))
+
+        batches = [missing[start:start + batch_size] for start in range(0, len(missing), batch_size)]
+        results = await asyncio.gather(*(
+            self._create_embeddings(batch, model, dimensions, encoding_format) for batch in batches
+        ))
+        fetched = {}
+        for batch, batch_vectors in zip(batches, results):
+            fetched.update(zip(batch, batch_vectors))
+        if cache and fetched:
+            await asyncio.to_thread(cache.put_many, fetched, model, dimensions)
+        vectors.update(fetched)
+
+        embeddings = [vectors[text] for text in texts]
+        return embeddings[0] if single else embeddings
+
+    async def _create_embeddings(self, texts: List[str], model, dimensions, encoding_format) -> List[np.ndarray]:
+        """发起单次异步嵌入请求，并按输入顺序返回向量"""
+        async def create():
+            async with self.embedding_semaphore:
+                return await self.embedding_client.embeddings.create(
+                    input=texts,
+                    model=model,
+                    dimensions=dimensions,
+                    encoding_format=encoding_format
+                )
+
+        async def fetch():
+            return _sorted_embeddings(await _acall_with_retry("embedding", model, _estimate_tokens("".join(texts)), create))
+        return await self.inflight_requests.do(make_request_key("embedding", model, dimensions, encoding_format, texts), fetch)
+
 
 maas_client = MaaSClient()
 
+# 异步客户端和信号量绑定事件循环，按事件循环分别缓存
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncMaaSClient]" = weakref.WeakKeyDictionary()
+
+# 同步调用方共用的后台事件循环，使其异步客户端和连接池在多次调用间复用
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_lock = threading.Lock()
+
+
+def _reset_after_fork() -> None:
+    # fork出的子进程中后台线程已不存在，继承的事件循环不会再运行；
+    # 异步客户端绑定父进程的事件循环，连接池和同步客户端的连接也不能与父进程共用，全部重新创建
+    global maas_client, _async_clients, _background_loop, _background_lock
+    maas_client = MaaSClient()
+    _async_clients = weakref.WeakKeyDictionary()
+    _background_loop = None
+    _background_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_maas_client() -> MaaSClient:
+    """获取进程内共享的MaaSClient实例"""
+    return maas_client
+
+
+def get_async_maas_client() -> AsyncMaaSClient:
+    """获取当前事件循环对应的AsyncMaaSClient实例，须在协程中调用"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncMaaSClient()
+        _async_clients[loop] = client
+    return client
+
+
+def coalesced_request_stats() -> Dict[str, Any]:
+    """返回被合并的并发请求数：同步客户端共用一个计数，异步客户端按事件循环分别计数"""
+    per_client = {
+        ("background" if loop is _background_loop else f"loop-{id(loop):x}"): client.inflight_requests.coalesced
+        for loop, client in list(_async_clients.items())
+    }
+    return {
+        "total": inflight_requests.coalesced + sum(per_client.values()),
+        "sync": inflight_requests.coalesced,
+        "async": per_client
+    }
+
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    """获取（必要时启动）后台事件循环线程"""
+    global _background_loop
+    with _background_lock:
+        if _background_loop is None or _background_loop.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="maas-event-loop", daemon=True).start()
+            _background_loop = loop
+        return _background_loop
+
+
+def run_sync(coro: Coroutine) -> Any:
+    """在后台事件循环中运行协程并阻塞等待结果，供同步代码调用异步接口"""
+    return asyncio.run_coroutine_threadsafe(coro, _get_background_loop()).result()
+
+
+async def run_on_background_loop(coro: Coroutine) -> Any:
+    """在后台事件循环中运行协程并等待结果，不阻塞当前事件循环
+
+    与run_sync的调用方共享状态（如管理器的索引锁）的协程通过此函数执行，保证都运行在同一个事件循环中。
+    """
+    loop = _get_background_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+async def aclose_maas_clients() -> None:
+    """关闭当前事件循环的异步客户端，以及后台事件循环和同步客户端的连接池（应用关闭时调用）"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+    await asyncio.to_thread(close_maas_clients)
+
+
+def close_maas_clients() -> None:
+    """关闭后台事件循环和同步客户端的连接池"""
+    global _background_loop
+    with _background_lock:
+        loop, _background_loop = _background_loop, None
+    if loop is not None and not loop.is_closed():
+        client = _async_clients.pop(loop, None)
+        if client is not None:
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(timeout=10)
+        loop.call_soon_threadsafe(loop.stop)
+    maas_client.close()
+
 def chat_completion(messages, model=None):
     return maas_client.chat_completion(messages, model)
 
 def vision_completion(image_path: str, prompt: str = "Describe this image.", model=None) -> str:
     """
     External interface to generate a description for an image using a Vision-Language Model (VLM).
-    
+
     Args:
         image_path (str): Path to the image file.
         prompt (str): Optional prompt to guide the VLM.
         model: Optional model name.
-        
+
     Returns:
         str: Description of the image.
     """
@@ -0,0 +1,141 @@
+import json
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("maas")
+
+# 延迟直方图的桶上界（毫秒），最后一个桶为+Inf
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class LatencyHistogram:
+    """固定分桶的延迟直方图"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, latency_ms: float) -> None:
+        index = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if latency_ms <= bound), len(LATENCY_BUCKETS_MS))
+        self.buckets[index] += 1
+        self.count += 1
+        self.total_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """按桶上界估算分位数（毫秒），落在+Inf桶时返回最大值"""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.buckets):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return float(LATENCY_BUCKETS_MS[index]) if index < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        bounds = [str(bound) for bound in LATENCY_BUCKETS_MS] + ["+Inf"]
+        return {
+            "count": self.count,
+            "avg_ms": self.total_ms / self.count if self.count else None,
+            "max_ms": self.max_ms,
+            "p50_ms": self.percentile(0.5),
+            "p90_ms": self.percentile(0.9),
+            "p99_ms": self.percentile(0.99),
+            "buckets": dict(zip(bounds, self.buckets))
+        }
+
+
+class EndpointMetrics:
+    """单个接口（llm/vlm/embedding）的调用统计"""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.models: Dict[str, int] = defaultdict(int)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retries,
+            "cache_hits": self.cache_hits,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "errors": dict(self.errors),
+            "models": dict(self.models),
+            "latency": self.latency.to_dict()
+        }
+
+
+class MaaSMetrics:
+    """MaaS调用的进程内统计，线程安全"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, EndpointMetrics] = defaultdict(EndpointMetrics)
+
+    def record_call(self, endpoint: str, model: Optional[str], latency_ms: float,
+                    prompt_tokens: int = 0, completion_tokens: int = 0,
+                    retries: int = 0, error: Optional[Exception] = None) -> None:
+        """记录一次逻辑调用（含重试），并输出一行结构化日志"""
+        with self._lock:
+            metrics = self._endpoints[endpoint]
+            metrics.calls += 1
+            metrics.retries += retries
+            metrics.prompt_tokens += prompt_tokens
+            metrics.completion_tokens += completion_tokens
+            metrics.models[model or "default"] += 1
+            metrics.latency.observe(latency_ms)
+            if error is not None:
+                metrics.failures += 1
+
+        logger.info(json.dumps({
+            "event": "maas_call",
+            "endpoint": endpoint,
+            "model": model,
+            "latency_ms": round(latency_ms, 1),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "retries": retries,
+            "status": "error" if error is not None else "ok",
+            "error": type(error).__name__ if error is not None else None
+        }, ensure_ascii=False))
+
+    def record_error(self, endpoint: str, error: Exception) -> None:
+        """记录一次失败的请求尝试"""
+        with self._lock:
+            self._endpoints[endpoint].errors[type(error).__name__] += 1
+
+    def record_cache_hit(self, endpoint: str, count: int = 1) -> None:
+        """记录缓存命中（未发起网络请求）"""
+        with self._lock:
+            self._endpoints[endpoint].cache_hits += count
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回各接口统计的快照"""
+        with self._lock:
+            return {endpoint: metrics.to_dict() for endpoint, metrics in self._endpoints.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+
+
+maas_metrics = MaaSMetrics()
+
+
+def get_maas_metrics() -> MaaSMetrics:
+    """获取进程内共享的MaaS统计实例"""
+    return maas_metrics
@@ -0,0 +1,94 @@
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict
+
+
+def make_request_key(*parts: Any) -> str:
+    """根据请求参数计算合并键"""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """合并多线程中相同键的并发调用
+
+    同一时刻同一个键只有一个线程真正执行func，其余线程等待并共享其结果或异常。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self.coalesced = 0
+
+    def do(self, key: str, func: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+# 执行方被取消时写入共享结果的标记，等待方看到后自行重试
+_LEADER_CANCELLED = object()
+
+
+class AsyncSingleFlight:
+    """合并同一事件循环中相同键的并发协程调用
+
+    执行方被取消时不取消共享的future，而是通知等待方重试，由其中一个接替执行；
+    只有等待方自身被取消时才会收到CancelledError。
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self.coalesced = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+        while future is not None:
+            # 等待方被取消时不影响正在执行的请求
+            result = await asyncio.shield(future)
+            if result is not _LEADER_CANCELLED:
+                return result
+            future = self._calls.get(key)
+
+        future = asyncio.get_running_loop().create_future()
+        # 没有等待方时避免“异常未被获取”的警告
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[key] = future
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.set_result(_LEADER_CANCELLED)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
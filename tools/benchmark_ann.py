@@ -0,0 +1,186 @@
+"""向量索引基准测试：对比不同索引类型和检索参数的召回率与延迟
+
+在临时集合中写入合成向量（或从.npy文件加载），以暴力检索结果为基准，
+逐一构建索引并扫描检索参数，输出 recall@k、p50/p99 延迟和QPS。
+
+用法：
+    python tools/benchmark_ann.py --num-vectors 50000 --index-types FLAT,IVF_FLAT,HNSW \\
+        --nprobe 8,16,32,64 --ef 32,64,128,256
+
+    # 使用milvus-lite本地文件（仅支持FLAT和IVF_FLAT）
+    python tools/benchmark_ann.py --uri /tmp/bench.db --index-types FLAT,IVF_FLAT
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, connections, utility
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config.config import MILVUS_INDEX_DEFAULTS  # noqa: E402
+from app.config import get_config  # noqa: E402
+
+config = get_config()
+
+COLLECTION_NAME = "ann_benchmark_collection"
+INDEX_NAME = "ann_benchmark_index"
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def make_vectors(num: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """生成带簇结构的单位向量，比均匀随机向量更接近真实嵌入分布"""
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, num)
+    vectors = centers[labels] + 0.5 * rng.standard_normal((num, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def ground_truth(data: np.ndarray, queries: np.ndarray, top_k: int, metric: str) -> np.ndarray:
+    """暴力计算每个查询的真实top_k"""
+    results = []
+    for start in range(0, len(queries), 256):
+        chunk = queries[start:start + 256]
+        if metric == "L2":
+            scores = (chunk ** 2).sum(1, keepdims=True) - 2 * chunk @ data.T + (data ** 2).sum(1)
+        else:
+            normed = data / np.linalg.norm(data, axis=1, keepdims=True) if metric == "COSINE" else data
+            scores = -(chunk @ normed.T)
+        results.append(np.argsort(scores, axis=1)[:, :top_k])
+    return np.concatenate(results)
+
+
+def create_collection(data: np.ndarray, batch_size: int) -> Collection:
+    if utility.has_collection(COLLECTION_NAME):
+        utility.drop_collection(COLLECTION_NAME)
+    schema = CollectionSchema([
+        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True),
+        FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=data.shape[1])
+    ])
+    collection = Collection(COLLECTION_NAME, schema)
+    for start in range(0, len(data), batch_size):
+        chunk = data[start:start + batch_size]
+        collection.insert([list(range(start, start + len(chunk))), chunk])
+    collection.flush()
+    return collection
+
+
+def search_settings(index_type: str, args: argparse.Namespace) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """返回索引构建参数和待扫描的检索参数列表"""
+    if index_type in ("IVF_FLAT", "IVF_SQ8"):
+        return {"nlist": args.nlist}, [{"nprobe": nprobe} for nprobe in args.nprobe]
+    if index_type == "HNSW":
+        return {"M": args.hnsw_m, "efConstruction": args.ef_construction}, [{"ef": ef} for ef in args.ef]
+    if index_type == "DISKANN":
+        return {}, [{"search_list": search_list} for search_list in args.search_list]
+    return MILVUS_INDEX_DEFAULTS[index_type][0], [MILVUS_INDEX_DEFAULTS[index_type][1]]
+
+
+def run_queries(collection: Collection, queries: np.ndarray, top_k: int, metric: str,
+                params: Dict[str, Any]) -> Tuple[np.ndarray, List[float]]:
+    """逐条检索以测量单次请求延迟"""
+    ids, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = collection.search(
+            data=[query],
+            anns_field="embedding",
+            param={"metric_type": metric, "params": params},
+            limit=top_k
+        )[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids.append([hit.id for hit in hits] + [-1] * (top_k - len(hits)))
+    return np.asarray(ids), latencies
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(row_found) & set(row_truth)) for row_found, row_truth in zip(found, truth))
+    return hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量索引召回率与延迟基准测试")
+    parser.add_argument("--uri", default=None, help="Milvus地址或milvus-lite文件路径，默认使用MILVUS_HOST/MILVUS_PORT")
+    parser.add_argument("--data", default=None, help="从.npy文件加载向量（N x dim），不指定时生成合成向量")
+    parser.add_argument("--num-vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=config.EMBEDDING_DIM)
+    parser.add_argument("--clusters", type=int, default=100, help="合成向量的簇数")
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--metric", default=config.MILVUS_METRIC_TYPE, choices=["L2", "IP", "COSINE"])
+    parser.add_argument("--index-types", default="FLAT,IVF_FLAT,IVF_SQ8,HNSW",
+                        help="逗号分隔，可选 " + ",".join(MILVUS_INDEX_DEFAULTS))
+    parser.add_argument("--nlist", type=int, default=128)
+    parser.add_argument("--nprobe", type=_int_list, default=[8, 16, 32, 64])
+    parser.add_argument("--hnsw-m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--ef", type=_int_list, default=[32, 64, 128, 256])
+    parser.add_argument("--search-list", type=_int_list, default=[50, 100, 200])
+    parser.add_argument("--insert-batch-size", type=int, default=config.MILVUS_INSERT_BATCH_SIZE)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.uri:
+        connections.connect("default", uri=args.uri)
+    else:
+        connections.connect("default", host=config.MILVUS_HOST, port=config.MILVUS_PORT,
+                            user=config.MILVUS_USER, password=config.MILVUS_PASSWORD)
+
+    rng = np.random.default_rng(args.seed)
+    if args.data:
+        data = np.load(args.data).astype(np.float32)
+    else:
+        data = make_vectors(args.num_vectors, args.dim, args.clusters, rng)
+    queries = data[rng.choice(len(data), args.num_queries, replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+    truth = ground_truth(data, queries, args.top_k, args.metric)
+
+    print(f"数据量 {len(data)} x {data.shape[1]}，查询 {len(queries)} 条，recall@{args.top_k}，度量 {args.metric}")
+    collection = create_collection(data, args.insert_batch_size)
+
+    rows = []
+    try:
+        for index_type in [item.strip().upper() for item in args.index_types.split(",") if item.strip()]:
+            build_params, sweep = search_settings(index_type, args)
+            collection.release()
+            if collection.has_index(index_name=INDEX_NAME):
+                collection.drop_index(index_name=INDEX_NAME)
+            start = time.perf_counter()
+            try:
+                collection.create_index("embedding", {
+                    "index_type": index_type, "metric_type": args.metric, "params": build_params
+                }, index_name=INDEX_NAME)
+                utility.wait_for_index_building_complete(COLLECTION_NAME, index_name=INDEX_NAME)
+            except Exception as e:
+                print(f"跳过 {index_type}: {e}")
+                continue
+            build_seconds = time.perf_counter() - start
+            collection.load()
+
+            for params in sweep:
+                if index_type == "HNSW":
+                    params = {"ef": max(params["ef"], args.top_k)}
+                found, latencies = run_queries(collection, queries, args.top_k, args.metric, params)
+                rows.append((
+                    index_type, build_params, params, build_seconds,
+                    recall_at_k(found, truth),
+                    float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99)),
+                    1000 * len(latencies) / sum(latencies)
+                ))
+    finally:
+        utility.drop_collection(COLLECTION_NAME)
+
+    print(f"\n{'索引':<10}{'构建参数':<32}{'检索参数':<22}{'构建(s)':>9}{'recall':>9}{'p50(ms)':>10}{'p99(ms)':>10}{'QPS':>9}")
+    for index_type, build_params, params, build_seconds, recall, p50, p99, qps in rows:
+        print(f"{index_type:<10}{str(build_params):<32}{str(params):<22}{build_seconds:>9.2f}"
+              f"{recall:>9.4f}{p50:>10.2f}{p99:>10.2f}{qps:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
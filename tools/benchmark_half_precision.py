@@ -0,0 +1,151 @@
+"""半精度向量存储基准测试：对比float32 / float16 / bfloat16的召回率损失和内存占用
+
+以float32暴力检索结果为基准，将库向量量化为各精度后重新检索，输出 recall@k、
+每条实体两个向量字段的字节数和按语料规模估算的向量内存。指定 --milvus 时同时在
+临时集合中用FLAT索引实际写入和检索各精度的向量。
+
+用法：
+    python tools/benchmark_half_precision.py --num-vectors 50000 --top-k 10
+
+    # 同时在milvus-lite本地文件中测试（bfloat16需要安装ml_dtypes）
+    python tools/benchmark_half_precision.py --milvus --uri /tmp/bench.db --num-vectors 20000
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import get_config  # noqa: E402
+from app.database.vectors import VECTOR_DTYPES, numpy_dtype, to_storage  # noqa: E402
+from tools.benchmark_ann import ground_truth, make_vectors, recall_at_k  # noqa: E402
+
+config = get_config()
+
+COLLECTION_NAME = "half_precision_benchmark_collection"
+INDEX_NAME = "half_precision_benchmark_index"
+
+
+def quantized_recall(data: np.ndarray, queries: np.ndarray, truth: np.ndarray,
+                     dtype: str, top_k: int, metric: str) -> float:
+    """库向量按存储精度量化后的暴力检索召回率，查询向量同样量化，与Milvus的行为一致"""
+    stored = to_storage(data, dtype).astype(np.float32)
+    quantized_queries = to_storage(queries, dtype).astype(np.float32)
+    return recall_at_k(ground_truth(stored, quantized_queries, top_k, metric), truth)
+
+
+def milvus_recall(data: np.ndarray, queries: np.ndarray, truth: np.ndarray, dtype: str,
+                  top_k: int, metric: str, batch_size: int) -> Tuple[float, float]:
+    """在临时集合中写入指定精度的向量并检索，返回(recall, p50延迟毫秒)"""
+    from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, utility
+
+    vector_type = {
+        "float32": DataType.FLOAT_VECTOR,
+        "float16": DataType.FLOAT16_VECTOR,
+        "bfloat16": DataType.BFLOAT16_VECTOR
+    }[dtype]
+    if utility.has_collection(COLLECTION_NAME):
+        utility.drop_collection(COLLECTION_NAME)
+    collection = Collection(COLLECTION_NAME, CollectionSchema([
+        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True),
+        FieldSchema(name="embedding", dtype=vector_type, dim=data.shape[1])
+    ]))
+    try:
+        for start in range(0, len(data), batch_size):
+            chunk = data[start:start + batch_size]
+            collection.insert([list(range(start, start + len(chunk))), list(to_storage(chunk, dtype))])
+        collection.flush()
+        collection.create_index("embedding", {"index_type": "FLAT", "metric_type": metric, "params": {}},
+                                index_name=INDEX_NAME)
+        collection.load()
+
+        ids, latencies = [], []
+        for query in to_storage(queries, dtype):
+            start = time.perf_counter()
+            hits = collection.search(data=[query], anns_field="embedding",
+                                     param={"metric_type": metric, "params": {}}, limit=top_k)[0]
+            latencies.append((time.perf_counter() - start) * 1000)
+            ids.append([hit.id for hit in hits] + [-1] * (top_k - len(hits)))
+        return recall_at_k(np.asarray(ids), truth), float(np.percentile(latencies, 50))
+    finally:
+        utility.drop_collection(COLLECTION_NAME)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="半精度向量存储的召回率与内存对比")
+    parser.add_argument("--data", default=None, help="从.npy文件加载向量（N x dim），不指定时生成合成向量")
+    parser.add_argument("--num-vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=config.EMBEDDING_DIM)
+    parser.add_argument("--clusters", type=int, default=100, help="合成向量的簇数")
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--metric", default=config.MILVUS_METRIC_TYPE, choices=["L2", "IP", "COSINE"])
+    parser.add_argument("--dtypes", default=",".join(VECTOR_DTYPES), help="逗号分隔，可选 " + ",".join(VECTOR_DTYPES))
+    parser.add_argument("--corpus-size", type=int, default=1_000_000, help="估算向量内存时使用的实体数")
+    parser.add_argument("--milvus", action="store_true", help="同时在Milvus临时集合中实测")
+    parser.add_argument("--uri", default=None, help="Milvus地址或milvus-lite文件路径，默认使用MILVUS_HOST/MILVUS_PORT")
+    parser.add_argument("--insert-batch-size", type=int, default=config.MILVUS_INSERT_BATCH_SIZE)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.data:
+        data = np.load(args.data).astype(np.float32)
+    else:
+        data = make_vectors(args.num_vectors, args.dim, args.clusters, rng)
+    queries = data[rng.choice(len(data), args.num_queries, replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+    truth = ground_truth(data, queries, args.top_k, args.metric)
+
+    if args.milvus:
+        from pymilvus import connections
+        if args.uri:
+            connections.connect("default", uri=args.uri)
+        else:
+            connections.connect("default", host=config.MILVUS_HOST, port=config.MILVUS_PORT,
+                                user=config.MILVUS_USER, password=config.MILVUS_PASSWORD)
+
+    print(f"数据量 {len(data)} x {data.shape[1]}，查询 {len(queries)} 条，recall@{args.top_k}，度量 {args.metric}")
+    rows: List[Dict] = []
+    for dtype in [item.strip().lower() for item in args.dtypes.split(",") if item.strip()]:
+        try:
+            itemsize = numpy_dtype(dtype).itemsize
+        except (ImportError, ValueError) as e:
+            print(f"跳过 {dtype}: {e}")
+            continue
+        # 每条实体有keywords_embedding和summary_embedding两个向量字段
+        entity_bytes = 2 * data.shape[1] * itemsize
+        row = {
+            "dtype": dtype,
+            "entity_bytes": entity_bytes,
+            "corpus_gib": entity_bytes * args.corpus_size / 2 ** 30,
+            "recall": quantized_recall(data, queries, truth, dtype, args.top_k, args.metric),
+            "milvus_recall": None,
+            "milvus_p50": None
+        }
+        if args.milvus:
+            try:
+                row["milvus_recall"], row["milvus_p50"] = milvus_recall(
+                    data, queries, truth, dtype, args.top_k, args.metric, args.insert_batch_size
+                )
+            except Exception as e:
+                print(f"Milvus测试 {dtype} 失败: {e}")
+        rows.append(row)
+
+    baseline = next((row["entity_bytes"] for row in rows if row["dtype"] == "float32"), None)
+    print(f"\n{'精度':<10}{'字节/实体':>10}{'内存(GiB)':>12}{'节省':>8}{'recall':>9}{'milvus recall':>15}{'p50(ms)':>10}")
+    for row in rows:
+        saved = f"{1 - row['entity_bytes'] / baseline:.0%}" if baseline else "-"
+        milvus_recall_text = f"{row['milvus_recall']:.4f}" if row["milvus_recall"] is not None else "-"
+        p50_text = f"{row['milvus_p50']:.2f}" if row["milvus_p50"] is not None else "-"
+        print(f"{row['dtype']:<10}{row['entity_bytes']:>10}{row['corpus_gib']:>12.2f}{saved:>8}"
+              f"{row['recall']:>9.4f}{milvus_recall_text:>15}{p50_text:>10}")
+    print(f"\n内存按 {args.corpus_size} 条实体、仅计向量数据估算，不含索引结构和标量字段。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""本地OpenAI兼容的MaaS模拟服务，用于离线压测
+
+提供 /v1/chat/completions（含JSON模式和图片输入）与 /v1/embeddings 接口：
+- 向量由文本哈希确定性生成，维度取请求的dimensions或EMBEDDING_DIM
+- 可配置各接口的延迟分布和错误注入比例
+
+用法：
+    python tools/fake_maas_server.py --port 9000 --chat-latency-ms 800 --error-rate 0.02
+
+然后在.env中将 LLM_BASE_URL / VLM_BASE_URL / EMBEDDING_BASE_URL 设置为 http://127.0.0.1:9000/v1 。
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import uvicorn
+from dotenv import load_dotenv
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+load_dotenv(override=True)
+
+LATENCY_DISTRIBUTIONS = ["fixed", "uniform", "normal", "lognormal", "exponential"]
+
+
+class FakeMaaSSettings:
+    """模拟服务配置"""
+
+    def __init__(self,
+                 embedding_dim: int = 1024,
+                 chat_latency_ms: float = 0.0,
+                 vision_latency_ms: float = 0.0,
+                 embedding_latency_ms: float = 0.0,
+                 latency_dist: str = "fixed",
+                 latency_jitter: float = 0.25,
+                 error_rate: float = 0.0,
+                 rate_limit_ratio: float = 0.5,
+                 retry_after: float = 1.0,
+                 seed: Optional[int] = None):
+        self.embedding_dim = embedding_dim
+        self.chat_latency_ms = chat_latency_ms
+        self.vision_latency_ms = vision_latency_ms
+        self.embedding_latency_ms = embedding_latency_ms
+        self.latency_dist = latency_dist
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+
+    def sample_latency(self, mean_ms: float) -> float:
+        """按配置的分布采样延迟（秒）"""
+        if mean_ms <= 0:
+            return 0.0
+        jitter = self.latency_jitter
+        if self.latency_dist == "uniform":
+            value = self.random.uniform(mean_ms * (1 - jitter), mean_ms * (1 + jitter))
+        elif self.latency_dist == "normal":
+            value = self.random.gauss(mean_ms, mean_ms * jitter)
+        elif self.latency_dist == "lognormal":
+            # 保持均值为mean_ms，jitter作为对数标准差
+            value = self.random.lognormvariate(np.log(mean_ms) - jitter ** 2 / 2, jitter)
+        elif self.latency_dist == "exponential":
+            value = self.random.expovariate(1 / mean_ms)
+        else:
+            value = mean_ms
+        return max(0.0, value) / 1000
+
+    def sample_error(self) -> Optional[JSONResponse]:
+        """按错误率注入429或5xx错误"""
+        if self.error_rate <= 0 or self.random.random() >= self.error_rate:
+            return None
+        if self.random.random() < self.rate_limit_ratio:
+            return JSONResponse(
+                status_code=429,
+                headers={"retry-after": str(self.retry_after)},
+                content={"error": {"message": "Rate limit exceeded (injected)", "type": "rate_limit_error", "code": "rate_limit"}}
+            )
+        status_code = self.random.choice([500, 502, 503])
+        return JSONResponse(
+            status_code=status_code,
+            content={"error": {"message": f"Upstream error {status_code} (injected)", "type": "server_error", "code": str(status_code)}}
+        )
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 2 + 1
+
+
+def deterministic_embedding(text: str, dim: int) -> np.ndarray:
+    """由文本哈希生成确定性的单位向量"""
+    rng = np.random.default_rng(int.from_bytes(_digest(text)[:8], "little"))
+    vector = rng.standard_normal(dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def _message_text(messages: List[Dict[str, Any]]) -> str:
+    """拼接消息中的全部文本内容"""
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            parts.extend(part.get("text", "") for part in content if part.get("type") == "text")
+    return "\n".join(parts)
+
+
+def _image_parts(messages: List[Dict[str, Any]]) -> List[str]:
+    """提取消息中的图片URL"""
+    images = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            images.extend(part["image_url"]["url"] for part in content if part.get("type") == "image_url")
+    return images
+
+
+def fake_json_answer(prompt: str) -> Dict[str, Any]:
+    """根据提示词哈希生成确定性的JSON回复，覆盖摘要、关键词和评估结论等字段"""
+    digest = _digest(prompt)
+    keywords = [f"关键词{digest[i] % 50}" for i in range(4)]
+    snippet = prompt.strip().replace("\n", " ")[-60:]
+    return {
+        "summary": f"模拟摘要（{digest.hex()[:8]}）：{snippet}",
+        "keywords": keywords,
+        "is_qualified": digest[0] % 2 == 0,
+        "conclusion": f"模拟评估结论（{digest.hex()[8:16]}）",
+        "content": snippet,
+        "evidence_type": "模拟类型"
+    }
+
+
+def create_app(settings: FakeMaaSSettings) -> FastAPI:
+    app = FastAPI(title="Fake MaaS Server")
+    stats = {"chat": 0, "vision": 0, "embeddings": 0, "errors": 0}
+
+    @app.post("/chat/completions")
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        images = _image_parts(messages)
+        kind = "vision" if images else "chat"
+        stats[kind] += 1
+
+        await asyncio.sleep(settings.sample_latency(
+            settings.vision_latency_ms if images else settings.chat_latency_ms
+        ))
+        error = settings.sample_error()
+        if error is not None:
+            stats["errors"] += 1
+            return error
+
+        prompt = _message_text(messages)
+        response_format = body.get("response_format") or {}
+        if images:
+            image_hash = hashlib.sha256("".join(images).encode("utf-8")).hexdigest()[:12]
+            content = f"模拟图片描述：共{len(images)}张图片（{image_hash}），提示词：{prompt[:40]}"
+        elif response_format.get("type") == "json_object" or "JSON" in prompt:
+            content = json.dumps(fake_json_answer(prompt), ensure_ascii=False)
+        else:
+            content = f"模拟回复（{_digest(prompt).hex()[:8]}）"
+
+        prompt_tokens = _estimate_tokens(prompt) + 1024 * len(images)
+        completion_tokens = _estimate_tokens(content)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model") or "fake-llm",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+    @app.post("/embeddings")
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        texts: Union[str, List[str]] = body.get("input", [])
+        if isinstance(texts, str):
+            texts = [texts]
+        stats["embeddings"] += 1
+
+        await asyncio.sleep(settings.sample_latency(settings.embedding_latency_ms))
+        error = settings.sample_error()
+        if error is not None:
+            stats["errors"] += 1
+            return error
+
+        dim = int(body.get("dimensions") or settings.embedding_dim)
+        encoding_format = body.get("encoding_format") or "float"
+        data = []
+        for index, text in enumerate(texts):
+            vector = deterministic_embedding(text, dim)
+            embedding = (
+                base64.b64encode(vector.tobytes()).decode("ascii")
+                if encoding_format == "base64" else vector.tolist()
+            )
+            data.append({"object": "embedding", "index": index, "embedding": embedding})
+
+        prompt_tokens = sum(_estimate_tokens(text) for text in texts)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model") or "fake-embedding",
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens}
+        }
+
+    @app.get("/stats")
+    async def get_stats():
+        """返回各接口请求数和注入错误数"""
+        return stats
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地OpenAI兼容的MaaS模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--embedding-dim", type=int, default=int(os.getenv("EMBEDDING_DIM", "1024")),
+                        help="请求未指定dimensions时的向量维度，默认取EMBEDDING_DIM")
+    parser.add_argument("--chat-latency-ms", type=float, default=0.0, help="LLM接口平均延迟（毫秒）")
+    parser.add_argument("--vision-latency-ms", type=float, default=0.0, help="VLM接口平均延迟（毫秒）")
+    parser.add_argument("--embedding-latency-ms", type=float, default=0.0, help="Embedding接口平均延迟（毫秒）")
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="fixed", help="延迟分布")
+    parser.add_argument("--latency-jitter", type=float, default=0.25,
+                        help="延迟抖动：uniform/normal为相对幅度，lognormal为对数标准差")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="错误注入比例（0~1）")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.5, help="注入错误中返回429的比例，其余返回5xx")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429响应的Retry-After秒数")
+    parser.add_argument("--seed", type=int, default=None, help="延迟和错误注入的随机种子")
+    args = parser.parse_args()
+
+    settings = FakeMaaSSettings(
+        embedding_dim=args.embedding_dim,
+        chat_latency_ms=args.chat_latency_ms,
+        vision_latency_ms=args.vision_latency_ms,
+        embedding_latency_ms=args.embedding_latency_ms,
+        latency_dist=args.latency_dist,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        rate_limit_ratio=args.rate_limit_ratio,
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()